@@ -1,25 +1,43 @@
 from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 import time
 from typing import Dict, Optional
 from dotenv import load_dotenv
 load_dotenv()
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain_core.runnables import RunnablePassthrough
+from langchain_openai import ChatOpenAI
 from langchain.globals import set_llm_cache
-from elasticsearch import Elasticsearch, helpers
+from elasticsearch import Elasticsearch
 from langchain_community.vectorstores import ElasticsearchStore
-import json
 import logging
-import random
 import os
+import math
+import atexit
+import hashlib
+import fnmatch
 from infrastructure.supabase_inf import Supabase_Infrastructure
+from infrastructure.swipe_deck import SwipeDeck, USER_CARD_COLUMNS
+from infrastructure.startup_cards import StartupCardStore
+from infrastructure.rate_limiter import RateLimiter, TRUSTED_PROXIES
+from infrastructure.ttl_cache import TTLCache
+from infrastructure.embedding_cache import QueryEmbeddingCache
+from infrastructure.embedding_store import EmbeddingStore
+from infrastructure.vector_profile import profile_from_env, RESUME_PROFILE
+from infrastructure.indexing_pipeline import IndexingPipeline
+from infrastructure.ranking import rrf_fuse
+from infrastructure.vector_index import LocalSearchBackend
+from infrastructure.matching import MatchingEngine
+from infrastructure.recommendations import RecommendationJob, get_recommendations
+from infrastructure.sse import stream_sse, StreamMetrics
+from infrastructure.response_cache import SemanticResponseCache
 
 set_llm_cache(None)
 
 app = Flask(__name__)
 CORS(app)
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
 
 class StartupManager:
     def __init__(self):
@@ -68,74 +86,145 @@ class StartupManager:
         return self.startups.get(startup_id)
 
 class FounderQA:
+    """
+    Stateless founder Q&A. Each startup context carries its own immutable
+    chain, built once and shared read-only between threads, so concurrent
+    requests for different startups never see each other's founders.
+    """
     def __init__(self):
         self.manager = StartupManager()
-        self.current_startup = None
         self.llm = ChatOpenAI(temperature=0.3, model="gpt-3.5-turbo", verbose=False)
-        self.qa_chain = None
-    
-    def set_startup(self, startup_id: str) -> bool:
-        self.current_startup = self.manager.get_startup(startup_id)
-        if self.current_startup:
-            self.setup_qa_chain()
-            return True
-        return False
     
-    def setup_qa_chain(self):
+    def build_context(self, startup: Dict) -> Dict:
+        """Assemble the founders_info text and the startup's prompt and chain"""
         template = """Answer questions about {company_name} founders:
         {founders_info}
         Question: {question}"""
         
-        prompt = ChatPromptTemplate.from_template(template)
-        
         founders_info = "\n\n".join([
             f"Founder {i+1}:\nName: {f['name']}\nTitle: {f['title']}\nBackground: {f['background']}\n"
             f"Skills: {', '.join(f['skills'])}\nInterests: {', '.join(f['interests'])}\n"
             f"Fun Fact: {f['fun_fact']}"
-            for i, f in enumerate(self.current_startup["founders"])
+            for i, f in enumerate(startup["founders"])
         ])
         
-        self.qa_chain = (
-            {
-                "question": RunnablePassthrough(),
-                "company_name": lambda x: self.current_startup["name"],
-                "founders_info": lambda x: founders_info
-            }
-            | prompt
-            | self.llm
+        prompt = ChatPromptTemplate.from_template(template).partial(
+            company_name=startup["name"],
+            founders_info=founders_info
         )
+        return {
+            **startup,
+            "founders_info": founders_info,
+            # Answers cached for one version of the founders are never served for another
+            "context_hash": hashlib.sha256(f"{startup['name']}\n{founders_info}".encode("utf-8")).hexdigest(),
+            "prompt": prompt,
+            "qa_chain": prompt | self.llm
+        }
+    
+    def ask_about_founders(self, context: Dict, question: str):
+        return context["qa_chain"].invoke({"question": question})
+    
+    def stream_about_founders(self, context: Dict, question: str):
+        return context["qa_chain"].stream({"question": question})
     
-    def ask_about_founders(self, question: str) -> str:
-        if not self.current_startup:
-            raise ValueError("No startup selected")
-        return self.qa_chain.invoke({"question": question})
+    async def aask_about_founders(self, context: Dict, question: str):
+        return await context["qa_chain"].ainvoke({"question": question})
+    
+    def astream_about_founders(self, context: Dict, question: str):
+        return context["qa_chain"].astream({"question": question})
 
 # Initialize the QA system
 qa_system = FounderQA()
 
+# Assembled founder context per startup, so follow-up questions skip Supabase
+founder_context_cache = TTLCache(
+    maxsize=int(os.getenv("FOUNDER_CONTEXT_CACHE_SIZE", 512)),
+    ttl=float(os.getenv("FOUNDER_CONTEXT_TTL", 600))
+)
+
+def assemble_founder_context(startup: Dict, cofounders: list) -> Dict:
+    """Turn a startup row and its cofounder user rows into a Q&A context"""
+    founders = [
+        {
+            "name": user.get('name', 'Unknown'),
+            "title": "Co-Founder",  # Default title
+            "background": user.get('about_me', ''),
+            "skills": [user.get('major', '')] if user.get('major') else [],
+            "interests": [],  # Can be extended if available
+            "fun_fact": ""  # Can be extended if available
+        }
+        for user in cofounders
+    ]
+    
+    return qa_system.build_context({
+        "id": str(startup['startup_id']),
+        "name": startup['name'],
+        "description": startup.get('about_content', ''),
+        "industry": startup.get('industry', ''),
+        "logo": startup.get('logo_path', ''),
+        "founders": founders
+    })
+
+def forget_startups(startup_ids):
+    """Drop everything derived from startup cards that were just rebuilt (None means all of them)"""
+    startup_deck.invalidate(startup_ids)
+    if startup_ids is None:
+        founder_context_cache.invalidate()
+        return
+    for startup_id in startup_ids:
+        founder_context_cache.invalidate(str(startup_id))
+
+# Startup + founder summaries, materialized once instead of joined on every request
+startup_cards = StartupCardStore(
+    max_age=float(os.getenv("STARTUP_CARDS_MAX_AGE", 600)),
+    on_change=forget_startups
+)
+
+def load_founder_context(startup_id) -> Optional[Dict]:
+    """Return the cached Q&A context for a startup, building it on a miss; None if the startup does not exist"""
+    context = founder_context_cache.get(str(startup_id))
+    if context is not None:
+        return context
+    
+    card = startup_cards.get(startup_id)
+    if not card:
+        return None
+    
+    context = assemble_founder_context(card, card["cofounders"])
+    if context["founders"]:
+        founder_context_cache.set(str(startup_id), context)
+    return context
+
 @app.route('/test', methods=['GET'])
 def test():
     return jsonify({"success": 200, "content": "hello"})
 
+# Pre-shuffled deck of user cards shared by the Matching and Welcome screens
+user_deck = SwipeDeck()
+
+def ranked_user_cards(user_id, count: int, offset: int):
+    """Cards of the best-matching cofounder candidates for `user_id`, best first; None without neighbor lists"""
+    if match_engine is None or user_id not in match_engine:
+        return None
+    ranked = match_engine.candidates(user_id, count, offset)
+    rows = {
+        str(user['user_id']): user
+        for user in Supabase_Infrastructure().get_users_by_ids([int(i) for i, _ in ranked], USER_CARD_COLUMNS)
+    }
+    return [{**rows[i], "match_score": score} for i, score in ranked if i in rows]
+
 @app.route('/load_users_swipe', methods=['GET'])
 def load_users_swipe():
     try:
-        supabase_inf = Supabase_Infrastructure()
-        user_ids = list(range(2000))  # More efficient way to create the list
-        random.shuffle(user_ids)
-        user_ids = user_ids[:25]  # Get 25 random user IDs
+        count = min(int(request.args.get('count', 25)), 100)
+        # ?user_id= serves that user's precomputed matches, paged with ?offset=
+        user_id = request.args.get('user_id')
+        offset = int(request.args.get('offset', 0))
+        ranked = ranked_user_cards(user_id, count, offset) if user_id else None
+        if ranked is not None:
+            return jsonify({"success": True, "content": ranked, "next_offset": offset + count})
         
-        users = []
-        for user_id in user_ids:
-            try:
-                # Add a small delay between requests to avoid overwhelming the server
-                time.sleep(0.1)
-                user_data = supabase_inf.get_user_by_id(f"{user_id}")
-                if user_data:  # Only append if we got valid data
-                    users.append(user_data)
-            except Exception as e:
-                logging.error(f"Error fetching user {user_id}: {str(e)}")
-                continue  # Skip this user and continue with the next
+        users = user_deck.draw(count)
         
         if not users:
             return jsonify({"success": False, "error": "No users could be loaded"}), 500
@@ -146,87 +235,73 @@ def load_users_swipe():
         logging.error(f"Error in load_users_swipe: {str(e)}")
         return jsonify({"success": False, "error": str(e)}), 500
 
-    return jsonify({"success": 200, "content": users})
-
 @app.route('/ask/<startup_id>', methods=['POST'])
 def ask(startup_id):
     try:
-        supabase_inf = Supabase_Infrastructure()
-        
-        # 1. Fetch startup data
-        startup_data = supabase_inf.client.table("startup_table") \
-            .select("*") \
-            .eq("startup_id", startup_id) \
-            .execute()
+        question = request.json.get('question', '')
+        if not question:
+            return jsonify({"error": "Question is required"}), 400
         
-        if not startup_data.data:
+        # 1. Fetch (or reuse) the startup and founder context
+        context = load_founder_context(startup_id)
+        if context is None:
             return jsonify({"error": "Startup not found"}), 404
-            
-        startup = startup_data.data[0]
-        
-        # 2. Parse cofounder IDs (format: "(id1, id2)")
-        cofounder_ids = []
-        if startup.get('cofounders'):
-            try:
-                cofounder_ids = [
-                    int(id.strip()) 
-                    for id in startup['cofounders'][1:-1].split(',')
-                    if id.strip().isdigit()
-                ]
-            except Exception as e:
-                logging.error(f"Error parsing cofounders: {str(e)}")
-                return jsonify({"error": "Invalid cofounders data"}), 400
-        
-        # 3. Fetch cofounder details
-        founders = []
-        for user_id in cofounder_ids:
-            try:
-                user_data = supabase_inf.client.table("user_table") \
-                    .select("*") \
-                    .eq("user_id", user_id) \
-                    .execute()
-                
-                if user_data.data:
-                    user = user_data.data[0]
-                    founders.append({
-                        "name": user.get('name', 'Unknown'),
-                        "title": "Co-Founder",  # Default title
-                        "background": user.get('about_me', ''),
-                        "skills": [user.get('major', '')] if user.get('major') else [],
-                        "interests": [],  # Can be extended if available
-                        "fun_fact": ""  # Can be extended if available
-                    })
-            except Exception as e:
-                logging.error(f"Error fetching cofounder {user_id}: {str(e)}")
-                continue
-        
-        if not founders:
+        if not context["founders"]:
             return jsonify({"error": "No founders found for this startup"}), 404
         
-        # 4. Set up QA system
-        qa_system.current_startup = {
-            "id": str(startup['startup_id']),
-            "name": startup['name'],
-            "description": startup.get('about_content', ''),
-            "founders": founders
-        }
-        qa_system.setup_qa_chain()
-        
-        # 5. Process question
-        question = request.json.get('question', '')
-        if not question:
-            return jsonify({"error": "Question is required"}), 400
-            
-        response = qa_system.ask_about_founders(question)
+        # 2. Replay a cached answer to the same (or a near-identical) question
+        vector = None
+        if response_cache:
+            answer, vector = response_cache.lookup(startup_id, context["context_hash"], question)
+            if answer is not None:
+                return jsonify({"answer": answer, "startup": context["name"], "cached": True})
+        
+        # 3. Process question with the startup's own chain
+        response = qa_system.ask_about_founders(context, question)
+        if response_cache:
+            response_cache.store(startup_id, context["context_hash"], question, vector, response.content)
         return jsonify({
             "answer": response.content,
-            "startup": qa_system.current_startup["name"]
+            "startup": context["name"]
         })
         
     except Exception as e:
         logging.error(f"Error in ask endpoint: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
+@app.route('/ask/cache/stats', methods=['GET'])
+def founder_context_cache_stats():
+    """Hit/miss counters of the founder context cache and, if enabled, the answer cache"""
+    return jsonify({
+        "success": True,
+        "stats": founder_context_cache.stats(),
+        "responses": response_cache.stats() if response_cache else None
+    })
+
+@app.route('/ask/cache', methods=['DELETE'])
+@app.route('/ask/cache/<startup_id>', methods=['DELETE'])
+def invalidate_founder_context(startup_id=None):
+    """Re-read the card(s) from Supabase and drop the cached context (and answers) of one startup, or of all"""
+    try:
+        if startup_id is None:
+            startup_cards.rebuild()
+            founder_context_cache.invalidate()
+        else:
+            if str(startup_id).isdigit():
+                startup_cards.refresh_startups([startup_id])
+            founder_context_cache.invalidate(str(startup_id))
+    except Exception as e:
+        logging.error(f"Error refreshing founder context: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+    if response_cache:
+        response_cache.invalidate(startup_id)
+    return jsonify({"success": True})
+
+@app.route('/ask/stream_metrics', methods=['GET'])
+def stream_metrics():
+    """Per-request time-to-first-token and tokens/sec of the most recent /ask_stream answers"""
+    return jsonify({"success": True, "streams": list(StreamMetrics.recent)})
+
 @app.route('/ask_stream/<startup_id>', methods=['POST', 'GET'])
 def ask_stream(startup_id):
     try:
@@ -254,94 +329,34 @@ def ask_stream(startup_id):
         if not question:
             return jsonify({"error": "Question is required"}), 400
 
-        # Fetch startup data
-        supabase_inf = Supabase_Infrastructure()
-        startup_data = supabase_inf.client.table("startup_table") \
-            .select("*") \
-            .eq("startup_id", startup_id) \
-            .execute()
-            
-        if not startup_data.data:
+        # Fetch (or reuse) the startup and founder context
+        context = load_founder_context(startup_id)
+        if context is None:
             return jsonify({"error": "Startup not found"}), 404
-            
-        startup = startup_data.data[0]
-        
-        # Parse cofounder IDs from string like "(2, 1482)"
-        # 2. Parse cofounder IDs
-        cofounder_ids = []
-        if startup.get('cofounders'):
-            try:
-                cofounder_ids = [
-                    int(id.strip()) 
-                    for id in startup['cofounders'][1:-1].split(',')
-                    if id.strip().isdigit()
-                ]
-            except Exception as e:
-                logging.error(f"Error parsing cofounders: {str(e)}")
-                return jsonify({"error": "Invalid cofounders data"}), 400
-        
-        # 3. Fetch cofounder details
-        founders = []
-        for user_id in cofounder_ids:
-            try:
-                user_data = supabase_inf.client.table("user_table") \
-                    .select("*") \
-                    .eq("user_id", user_id) \
-                    .execute()
-                
-                if user_data.data:
-                    user = user_data.data[0]
-                    founders.append({
-                        "name": user.get('name', 'Unknown'),
-                        "title": "Co-Founder",
-                        "background": user.get('about_me', ''),
-                        "skills": [user.get('major', '')] if user.get('major') else [],
-                        "interests": [],
-                        "fun_fact": ""
-                    })
-            except Exception as e:
-                logging.error(f"Error fetching cofounder {user_id}: {str(e)}")
-                continue
-        
-        if not founders:
+        if not context["founders"]:
             return jsonify({"error": "No founders found for this startup"}), 404
         
-        # Set up QA system with only existing fields
-        qa_system.current_startup = {
-            "id": str(startup['startup_id']),
-            "name": startup['name'],
-            "description": startup.get('about_content', ''),
-            "industry": startup.get('industry', ''),
-            "logo": startup.get('logo_path', ''),
-            "founders": founders
-        }
-        qa_system.setup_qa_chain()
-        
-        # Stream response
-        def generate():
-            try:
-                process = qa_system.qa_chain.stream({"question": question})
-                buffer = ""
-                for chunk in process:
-                    # Convert chunk to string
-                    chunk_str = str(chunk.content) if hasattr(chunk, 'content') else str(chunk)
-                    buffer += chunk_str
-                    
-                    # Split by newlines to handle partial chunks
-                    while '\n' in buffer:
-                        line, buffer = buffer.split('\n', 1)
-                        yield f"data: {json.dumps({'text': line})}\n\n"
-                    
-                    # If no newline, send what we have
-                    if buffer:
-                        yield f"data: {json.dumps({'text': buffer})}\n\n"
-                        buffer = ""
-            except Exception as e:
-                logging.error(f"Streaming error: {str(e)}")
-                yield f"data: {json.dumps({'error': str(e)})}\n\n"
+        # Replay a cached answer through the same SSE framing
+        vector = None
+        if response_cache:
+            answer, vector = response_cache.lookup(startup_id, context["context_hash"], question)
+            if answer is not None:
+                return Response(
+                    stream_sse(iter([answer]), label=f"{startup_id} (cached)"),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'Connection': 'keep-alive'}
+                )
+        
+        def remember(answer):
+            if response_cache:
+                response_cache.store(startup_id, context["context_hash"], question, vector, answer)
+        
+        # Stream response: tokens grouped into events, heartbeats, TTFT/tokens-per-second metrics
+        generate = stream_sse(qa_system.stream_about_founders(context, question), label=str(startup_id),
+                              on_complete=remember)
         
         return Response(
-            generate(),
+            generate,
             mimetype='text/event-stream',
             headers={
                 'Content-Type': 'text/event-stream',
@@ -353,9 +368,21 @@ def ask_stream(startup_id):
     except Exception as e:
         logging.error(f"Endpoint error: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
+rate_limiter = RateLimiter.from_env()
+
 @app.before_request
 def limit_requests():
-    time.sleep(0.1)
+    # CORS preflights are answered by flask_cors and must not spend tokens
+    if request.method == 'OPTIONS':
+        return None
+    # remote_addr only reflects X-Forwarded-For behind TRUSTED_PROXIES (ProxyFix)
+    retry_after = rate_limiter.check(request.remote_addr or 'unknown', request.path)
+    if retry_after is None:
+        return None
+    response = jsonify({"success": False, "error": "Rate limit exceeded"})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(math.ceil(retry_after))
+    return response
 
 @app.route('/startups', methods=['GET'])
 def list_startups():
@@ -365,53 +392,20 @@ def list_startups():
             for id, data in qa_system.manager.startups.items()
         ]
     })
+# Startup cards are dealt straight from the materialized card store
+startup_deck = SwipeDeck(
+    table="startup_table",
+    id_column="startup_id",
+    deck_size=100,
+    low_watermark=20,
+    source=startup_cards
+)
+
 @app.route('/load_startups_swipe', methods=['GET'])
 def load_startups_swipe():
     try:
-        supabase_inf = Supabase_Infrastructure()
-        
-        # Get all startups
-        startups_data = supabase_inf.client.table("startup_table").select("*").execute()
-        
-        # Shuffle the startups
-        shuffled_startups = list(startups_data.data)
-        random.shuffle(shuffled_startups)
-        
-        # Limit to 20 startups
-        startups = shuffled_startups[:10]
-        
-        # For each startup, get cofounder details
-        for startup in startups:
-            cofounder_ids = []
-            if startup.get('cofounders'):
-                try:
-                    cofounder_ids = [int(id.strip()) for id in startup['cofounders'][1:-1].split(',')]
-                except Exception as e:
-                    logging.error(f"Error parsing cofounders: {str(e)}")
-                    continue
-            
-            # Get cofounder details
-            cofounders = []
-            for user_id in cofounder_ids:
-                try:
-                    user_data = supabase_inf.client.table("user_table")\
-                        .select("*")\
-                        .eq("user_id", user_id)\
-                        .execute()
-                    
-                    if user_data.data:
-                        user = user_data.data[0]
-                        cofounders.append({
-                            "name": user.get('name', 'Unknown'),
-                            "university": user.get('university', ''),
-                            "major": user.get('major', ''),
-                            "profile_pic": user.get('profile_pic_path', '')
-                        })
-                except Exception as e:
-                    logging.error(f"Error fetching cofounder {user_id}: {str(e)}")
-                    continue
-            
-            startup['cofounders'] = cofounders
+        count = min(int(request.args.get('count', 10)), 50)
+        startups = startup_deck.draw(count)
         
         return jsonify({
             "success": True,
@@ -424,61 +418,22 @@ def load_startups_swipe():
 @app.route('/startups/<int:startup_id>', methods=['GET'])
 def get_startup(startup_id):
     try:
-        supabase_inf = Supabase_Infrastructure()
+        # Startup row and founder summaries come precomputed from the card store
+        card = startup_cards.get(startup_id)
         
-        # Get the startup by ID
-        startup = supabase_inf.get_startup_by_id(startup_id)
-        
-        if not startup:
+        if not card:
             return jsonify({"success": False, "error": "Startup not found"}), 404
         
-        # Parse cofounder IDs from the string format "(id1, id2)"
-        cofounder_ids = []
-        if startup.get('cofounders'):
-            try:
-                # Remove parentheses and split by commas
-                cofounder_ids = [
-                    int(id.strip()) 
-                    for id in startup['cofounders'][1:-1].split(',')
-                    if id.strip().isdigit()
-                ]
-            except Exception as e:
-                logging.error(f"Error parsing cofounders: {str(e)}")
-        
-        # Get cofounder details
-        cofounders = []
-        for user_id in cofounder_ids:
-            try:
-                user_data = supabase_inf.client.table("user_table") \
-                    .select("*") \
-                    .eq("user_id", user_id) \
-                    .execute()
-                
-                if user_data.data:
-                    user = user_data.data[0]
-                    cofounders.append({
-                        "user_id": user['user_id'],
-                        "name": user.get('name', 'Unknown'),
-                        "university": user.get('university', ''),
-                        "major": user.get('major', ''),
-                        "profile_pic": user.get('profile_pic_path', ''),
-                        "linkedin": user.get('linked_in_url', ''),
-                        "about_me": user.get('about_me', '')
-                    })
-            except Exception as e:
-                logging.error(f"Error fetching cofounder {user_id}: {str(e)}")
-                continue
-        
         # Prepare the response
         response_data = {
-            "id": startup['startup_id'],
-            "name": startup['name'],
-            "description": startup.get('about_content', ''),
-            "industry": startup.get('industry', ''),
-            "logo": startup.get('logo_path', ''),
-            "business_plan": startup.get('business_plan_content', ''),
-            "cofounder_ids": cofounder_ids,
-            "cofounders": cofounders
+            "id": card['startup_id'],
+            "name": card['name'],
+            "description": card['about_content'],
+            "industry": card['industry'],
+            "logo": card['logo_path'],
+            "business_plan": card['business_plan_content'],
+            "cofounder_ids": card['cofounder_ids'],
+            "cofounders": card['cofounders']
         }
         
         return jsonify({"success": True, "startup": response_data})
@@ -486,15 +441,52 @@ def get_startup(startup_id):
     except Exception as e:
         logging.error(f"Error in get_startup endpoint: {str(e)}")
         return jsonify({"success": False, "error": "Internal server error"}), 500
+
+@app.route('/startups/cards/refresh', methods=['POST'])
+def refresh_startup_cards():
+    """Rebuild the cards touched by a change: {"startup_ids": [...], "user_ids": [...]}, or all of them"""
+    try:
+        data = request.get_json(silent=True) or {}
+        startup_ids, user_ids = data.get('startup_ids', []), data.get('user_ids', [])
+        if not startup_ids and not user_ids:
+            startup_cards.rebuild()
+        else:
+            startup_cards.refresh_startups(startup_ids)
+            startup_cards.refresh_users(user_ids)
+        return jsonify({"success": True, "stats": startup_cards.stats()})
+    except Exception as e:
+        logging.error(f"Error refreshing startup cards: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+ELASTICSEARCH_URL = "https://my-elasticsearch-project-b7242c.es.us-central1.gcp.elastic.cloud:443"  # Or your cloud URL
 es = Elasticsearch(
-    ["https://my-elasticsearch-project-b7242c.es.us-central1.gcp.elastic.cloud:443"],  # Or your cloud URL
+    [ELASTICSEARCH_URL],
     api_key=os.getenv("ELASTICSEARCH_API_KEY"),
     verify_certs=False,
     timeout=30,  # seconds
     max_retries=3,
     retry_on_timeout=True
 )
-embeddings = OpenAIEmbeddings()
+# VECTOR_PROFILE: embedding model, dimensions and ES vector storage, see infrastructure/vector_profile.py
+vector_profile = profile_from_env()
+embeddings = vector_profile.embeddings()
+# (model, content hash) -> vector on local disk: reindexing unchanged text costs no embedding calls
+EMBEDDING_STORE_DIR = os.getenv("EMBEDDING_STORE_DIR", "data/embeddings")
+document_embeddings = EmbeddingStore(EMBEDDING_STORE_DIR, embeddings)
+# Normalized query -> vector, optionally persisted across restarts
+query_embedding_cache = QueryEmbeddingCache(
+    embeddings,
+    maxsize=int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 4096)),
+    path=os.getenv("QUERY_EMBEDDING_CACHE_PATH"),
+    namespace=vector_profile.key
+)
+atexit.register(query_embedding_cache.save)
+# Opt-in semantic cache of founder Q&A answers (QA_RESPONSE_CACHE=1)
+response_cache = SemanticResponseCache(
+    query_embedding_cache,
+    threshold=float(os.getenv("QA_RESPONSE_CACHE_THRESHOLD", 0.95)),
+    ttl=float(os.getenv("QA_RESPONSE_CACHE_TTL", 3600)),
+    maxsize=int(os.getenv("QA_RESPONSE_CACHE_SIZE", 5000))
+) if os.getenv("QA_RESPONSE_CACHE") == "1" else None
 # ---------------- mappings.py (or keep in ElasticSearchManager) ----------------
 USER_MAPPING = {
     "mappings": {
@@ -506,14 +498,13 @@ USER_MAPPING = {
             "about_me":     {"type": "text"},
 
             # >>> top-level dense_vector, no multi-field <<<
-            "about_me_vector": {
-                "type":       "dense_vector",
-                "dims":       1536,
-                "index":      True,
-                "similarity": "cosine"
-            },
+            "about_me_vector": vector_profile.mapping(),
 
-            "is_cofounder": {"type": "boolean"}
+            "is_cofounder": {"type": "boolean"},
+
+            # hashes of the embedded text / whole row, used by incremental reindex
+            "content_hash": {"type": "keyword"},
+            "row_hash":     {"type": "keyword"}
         }
     }
 }
@@ -526,24 +517,53 @@ STARTUP_MAPPING = {
             "industry":     {"type": "keyword"},
             "about_content":{"type": "text"},
 
-            "about_content_vector": {
-                "type":       "dense_vector",
-                "dims":       1536,
-                "index":      True,
-                "similarity": "cosine"
-            },
+            "about_content_vector": vector_profile.mapping(),
+
+            "cofounders":   {"type": "keyword"},
 
-            "cofounders":   {"type": "keyword"}
+            "content_hash": {"type": "keyword"},
+            "row_hash":     {"type": "keyword"}
         }
     }
 }
 
+# Never shipped to clients: 1536-float vectors (about_me_vector, resume_embedding, ...) and reindex bookkeeping
+SOURCE_EXCLUDES = ["*_vector", "*_embedding", "content_hash", "row_hash"]
+
+def allowed_fields(fields):
+    """Requested `fields` minus anything SOURCE_EXCLUDES keeps out of responses"""
+    return [field for field in fields or []
+            if not any(fnmatch.fnmatchcase(field, pattern) for pattern in SOURCE_EXCLUDES)]
+
 class ElasticSearchManager:
     def __init__(self):
         self.supabase      = Supabase_Infrastructure()
-        self.user_index    = "user_index3"
-        self.startup_index = "startup_index"
-        self._ensure_indices_exist()
+        self.user_index    = "user_index3" + vector_profile.index_suffix
+        self.startup_index = "startup_index" + vector_profile.index_suffix
+        # HNSW candidates examined per shard; higher = better recall, slower
+        self.knn_num_candidates = int(os.getenv("KNN_NUM_CANDIDATES", 100))
+        # Reciprocal rank fusion: candidates per retriever and the k in 1 / (k + rank)
+        self.rrf_window        = int(os.getenv("RRF_WINDOW", 20))
+        self.rrf_rank_constant = int(os.getenv("RRF_RANK_CONSTANT", 60))
+        # Per-index search timeouts; a slower index comes back with partial hits
+        self.default_search_timeout = os.getenv("SEARCH_TIMEOUT", "1s")
+        self.search_timeouts = {
+            self.user_index:    os.getenv("USER_SEARCH_TIMEOUT", self.default_search_timeout),
+            self.startup_index: os.getenv("STARTUP_SEARCH_TIMEOUT", self.default_search_timeout),
+        }
+        self.pipeline      = IndexingPipeline(
+            es, document_embeddings, self.supabase,
+            batch_size=int(os.getenv("REINDEX_EMBED_BATCH_SIZE", 64)),
+            max_workers=int(os.getenv("REINDEX_EMBED_WORKERS", 4)),
+            encode=vector_profile.encode
+        )
+        # SEARCH_BACKEND=numpy answers /search from a local memory-mapped index (no cluster)
+        self.local_backend = None
+        if os.getenv("SEARCH_BACKEND", "elasticsearch") == "numpy":
+            self.local_backend = LocalSearchBackend(os.getenv("LOCAL_INDEX_DIR", "data/vector_index"),
+                                                    dims=vector_profile.dims)
+        else:
+            self._ensure_indices_exist()
 
     def _ensure_indices_exist(self):
         """Create the two indices with correct mappings if they do not exist."""
@@ -575,59 +595,40 @@ class ElasticSearchManager:
                 }
             })
         return q
-    def index_all_data(self):
-        """Index all users and startups from Supabase"""
-        self._index_users()
-        self._index_startups()
-
-    def _index_users(self):
-        """Bulk index all users"""
-        users = self.supabase.client.table("user_table").select("*").execute()
-        
-        actions = []
-        for user in users.data:
-            embedding = embeddings.embed_query(user.get('about_me', ''))
-            actions.append({
-                "_index": self.user_index,
-                "_id": user['user_id'],
-                "_source": {
-                    **user,
-                    "about_me_vector": embedding
-                }
-            })
-        
-        helpers.bulk(es, actions)
-        logging.info(f"Indexed {len(actions)} users")
-
-    def _index_startups(self):
-        """Bulk index all startups"""
-        startups = self.supabase.client.table("startup_table").select("*").execute()
-        
-        actions = []
-        for startup in startups.data:
-            embedding = embeddings.embed_query(startup.get('about_content', ''))
-            actions.append({
-                "_index": self.startup_index,
-                "_id": startup['startup_id'],
-                "_source": {
-                    **startup,
-                    "about_content_vector": embedding
-                }
-            })
-        
-        helpers.bulk(es, actions)
-        logging.info(f"Indexed {len(actions)} startups")
+    def index_all_data(self, incremental: bool = False):
+        """Index all users and startups from Supabase; incremental only touches changed rows"""
+        return {
+            "users":    self._index_users(incremental),
+            "startups": self._index_startups(incremental),
+        }
 
-    def _make_query(self, query, embed, vec_field, search_type, limit):
-        """Return an ES DSL body that targets the given vector field."""
+    def _index_users(self, incremental: bool = False):
+        """Stream all users through the batched embedding pipeline"""
+        index_table = self.pipeline.index_table_incremental if incremental else self.pipeline.index_table
+        return index_table("user_table", "user_id", self.user_index,
+                           "about_me", "about_me_vector")
+
+    def _index_startups(self, incremental: bool = False):
+        """Stream all startups through the batched embedding pipeline"""
+        index_table = self.pipeline.index_table_incremental if incremental else self.pipeline.index_table
+        return index_table("startup_table", "startup_id", self.startup_index,
+                           "about_content", "about_content_vector")
+
+    def _make_query(self, query, embed, vec_field, search_type, limit,
+                    exact=False, k=None, num_candidates=None):
+        """
+        Return an ES DSL body that targets the given vector field.
+
+        Vector relevance uses the approximate (HNSW) `knn` section; with
+        exact=True it falls back to brute-force script_score over every doc.
+        """
         body = {
             "size": limit,
-            "query": {"bool": {"should": []}}
         }
 
         # text relevance
         if search_type in ("text", "hybrid"):
-            body["query"]["bool"]["should"].append({
+            body["query"] = {"bool": {"should": [{
                 "multi_match": {
                     "query":  query,
                     "fields": [
@@ -635,58 +636,220 @@ class ElasticSearchManager:
                         "major", "industry", "university"
                     ]
                 }
-            })
+            }]}}
 
         # vector relevance
         if search_type in ("vector", "hybrid"):
-            body["query"]["bool"]["should"].append({
-                "script_score": {
-                    "query": {"match_all": {}},
-                    "script": {
-                        "source": "cosineSimilarity(params.qv, params.field) + 1.0",
-                        "params": {"qv": embed, "field": vec_field}
+            if exact:
+                body.setdefault("query", {"bool": {"should": []}})
+                body["query"]["bool"]["should"].append({
+                    "script_score": {
+                        "query": {"match_all": {}},
+                        "script": {
+                            "source": "cosineSimilarity(params.qv, params.field) + 1.0",
+                            "params": {"qv": embed, "field": vec_field}
+                        }
                     }
+                })
+            else:
+                k = k or limit
+                body["knn"] = {
+                    "field":          vec_field,
+                    "query_vector":   embed,
+                    "k":              k,
+                    "num_candidates": max(num_candidates or self.knn_num_candidates, k)
                 }
-            })
         return body
 
     # ---------- replace the entire existing search() method ----------
-    def search(self, query: str, search_type: str = "hybrid", limit: int = 10):
-        """Run text / vector / hybrid search across both indices."""
-        query_embedding = embeddings.embed_query(query)
-
-        # Build one body per index, each with its correct vector field
-        user_query    = self._make_query(query, query_embedding,
-                                         "about_me_vector",
-                                         search_type, limit)
-
-        startup_query = self._make_query(query, query_embedding,
-                                         "about_content_vector",
-                                         search_type, limit)
-
-        # Execute
-        user_hits    = es.search(index=self.user_index,    body=user_query)["hits"]["hits"]
-        startup_hits = es.search(index=self.startup_index, body=startup_query)["hits"]["hits"]
+    def search(self, query: str, search_type: str = "hybrid", limit: int = 10,
+               exact: bool = False, k: int = None, num_candidates: int = None,
+               fields: list = None):
+        """Run text / vector / hybrid / rrf search across both indices; `fields` projects each hit's _source."""
+        # Text-only search never uses the vector, so skip the embedding call entirely
+        query_embedding = None if search_type == "text" else query_embedding_cache.embed(query)
+        fields = allowed_fields(fields)
+
+        if self.local_backend:
+            return self.local_backend.search(query, query_embedding, search_type, limit, fields)
+
+        searches = self.plan_search(query, query_embedding, search_type, limit, exact, k, num_candidates)
+        responses = es.msearch(body=self.msearch_body(searches, fields))["responses"]
+        hits, partial = self.parse_msearch(searches, responses)
+        return self.finish_search(search_type, hits, partial, limit)
+
+    def plan_search(self, query, query_embedding, search_type, limit,
+                    exact=False, k=None, num_candidates=None):
+        """
+        Return the (index, body) pairs a search needs.
+
+        Plain modes build one body per index, each with its correct vector
+        field. The rrf mode is a reciprocal-rank-fusion hybrid: a lexical
+        and a kNN retrieval per index, each over a small candidate window,
+        fused by rank in `finish_search` so BM25 and cosine scales never mix.
+        """
+        if query_embedding is not None:
+            query_embedding = vector_profile.encode(query_embedding)
+        targets = ((self.user_index, "about_me_vector"),
+                   (self.startup_index, "about_content_vector"))
+        if search_type != "rrf":
+            return [
+                (index, self._make_query(query, query_embedding, vec_field,
+                                         search_type, limit, exact, k, num_candidates))
+                for index, vec_field in targets
+            ]
+
+        window = k or max(2 * limit, self.rrf_window)
+        searches = []
+        for index, vec_field in targets:
+            searches.append((index, self._make_query(query, query_embedding, vec_field, "text", window)))
+            searches.append((index, self._make_query(query, query_embedding, vec_field, "vector", window,
+                                                     k=window, num_candidates=num_candidates)))
+        return searches
+
+    def finish_search(self, search_type, hits, partial, limit):
+        """Shape the hit lists returned for `plan_search`'s searches into the API response"""
+        if search_type == "rrf":
+            user_hits    = rrf_fuse(hits[0:2], limit, self.rrf_rank_constant)
+            startup_hits = rrf_fuse(hits[2:4], limit, self.rrf_rank_constant)
+        else:
+            user_hits, startup_hits = hits
 
         # Return just _source (add _score if you like)
         return {
             "users":    [hit["_source"] for hit in user_hits],
             "startups": [hit["_source"] for hit in startup_hits],
+            "partial":  partial,
         }
 
+    def msearch_body(self, searches, fields=None):
+        """
+        Turn (index, body) pairs into the lines of a single _msearch request.
+
+        Every body carries the per-index `timeout`, so a slow index returns
+        the hits collected so far instead of failing the whole search.
+        Vectors never leave the cluster: `_source` is the requested `fields`
+        (or everything) minus SOURCE_EXCLUDES, which also wins over wildcards.
+        """
+        source = {"excludes": SOURCE_EXCLUDES}
+        if fields:
+            source["includes"] = fields
+        lines = []
+        for index, body in searches:
+            lines.append({"index": index})
+            lines.append({
+                **body,
+                "_source": source,
+                "timeout": self.search_timeouts.get(index, self.default_search_timeout)
+            })
+        return lines
+
+    def parse_msearch(self, searches, responses):
+        """Return (one hit list per search, partial); a failed index yields no hits"""
+        results, partial = [], False
+        for (index, _), response in zip(searches, responses):
+            if "error" in response:
+                logging.error(f"Search on {index} failed: {response['error']}")
+                results.append([])
+                partial = True
+                continue
+            if response.get("timed_out"):
+                logging.warning(f"Search on {index} timed out, returning partial hits")
+                partial = True
+            results.append(response["hits"]["hits"])
+        return results, partial
+
 # Initialize the search manager
 search_manager = ElasticSearchManager()
 
+# Precomputed cofounder neighbor lists, rebuilt after every reindex
+MATCHES_PATH = os.getenv("MATCHES_PATH", "data/matches/users")
+match_engine = None
+if os.path.exists(f"{MATCHES_PATH}.meta.json"):
+    try:
+        match_engine = MatchingEngine.load(MATCHES_PATH)
+    except Exception as e:
+        logging.error(f"Could not load cofounder matches: {str(e)}")
+
+def rebuild_matches():
+    """Recompute every user's top-K candidates from the about_me vectors and swap them in"""
+    global match_engine
+    started = time.perf_counter()
+    options = {
+        "k": int(os.getenv("MATCH_TOP_K", 100)),
+        "same_major_weight": float(os.getenv("MATCH_SAME_MAJOR_WEIGHT", -0.05)),
+        "same_university_weight": float(os.getenv("MATCH_SAME_UNIVERSITY_WEIGHT", 0.03)),
+        "exclude_cofounders": os.getenv("MATCH_EXCLUDE_COFOUNDERS") == "1",
+    }
+    if search_manager.local_backend:
+        engine = MatchingEngine.from_vector_index(search_manager.local_backend.users, **options)
+    else:
+        engine = MatchingEngine.from_elasticsearch(es, search_manager.user_index, "about_me_vector", **options)
+    os.makedirs(os.path.dirname(MATCHES_PATH) or ".", exist_ok=True)
+    engine.save(MATCHES_PATH)
+    match_engine = engine
+    return {"users": len(engine), "k": engine.params["k"], "seconds": round(time.perf_counter() - started, 2)}
+
 @app.route('/search/reindex', methods=['POST'])
 def reindex():
-    """Endpoint to trigger reindexing of all data"""
+    """Endpoint to trigger reindexing of all data; ?mode=incremental only re-embeds changed rows"""
     try:
-        search_manager.index_all_data()
-        return jsonify({"success": True, "message": "Data reindexed successfully"})
+        incremental = request.args.get('mode', 'full') == 'incremental'
+        store_before = document_embeddings.stats()
+        stats = search_manager.index_all_data(incremental=incremental)
+        try:
+            stats["matches"] = rebuild_matches()
+        except Exception as e:
+            # The indices are already up to date; the previous neighbor lists keep serving
+            logging.error(f"Rebuilding matches failed: {str(e)}")
+            stats["matches"] = {"success": False, "error": str(e)}
+        stats["embedding_store"] = document_embeddings.stats_since(store_before)
+        return jsonify({"success": True, "message": "Data reindexed successfully", "stats": stats})
     except Exception as e:
         logging.error(f"Reindexing failed: {str(e)}")
         return jsonify({"success": False, "error": str(e)}), 500
 
+# Startup -> candidate recommendations, scored against the resume embeddings the retriever uses.
+# Those come from outside this server, so VECTOR_PROFILE does not apply here.
+recommendation_job = RecommendationJob(
+    es,
+    EmbeddingStore(EMBEDDING_STORE_DIR, RESUME_PROFILE.embeddings()),
+    top_n=int(os.getenv("RECOMMENDATION_TOP_N", 50)),
+    batch_size=int(os.getenv("REINDEX_EMBED_BATCH_SIZE", 64)),
+    max_workers=int(os.getenv("REINDEX_EMBED_WORKERS", 4))
+)
+
+@app.route('/recommendations/rebuild', methods=['POST'])
+def rebuild_recommendations():
+    """Recompute the top candidates of every startup into recommendation_table"""
+    try:
+        stats = recommendation_job.run()
+        return jsonify({"success": True, "stats": stats})
+    except Exception as e:
+        logging.error(f"Recommendation job failed: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/startups/<int:startup_id>/candidates', methods=['GET'])
+def startup_candidates(startup_id):
+    """Precomputed candidates for the startup workspace, best first"""
+    try:
+        limit = min(int(request.args.get('limit', 20)), 100)
+        offset = int(request.args.get('offset', 0))
+        supabase_inf = Supabase_Infrastructure()
+        ranked = get_recommendations(supabase_inf, startup_id, limit, offset)
+        users = {
+            user['user_id']: user
+            for user in supabase_inf.get_users_by_ids([row['user_id'] for row in ranked], USER_CARD_COLUMNS)
+        }
+        candidates = [
+            {**users[row['user_id']], "rank": row['rank'], "match_score": row['score']}
+            for row in ranked if row['user_id'] in users
+        ]
+        return jsonify({"success": True, "candidates": candidates, "next_offset": offset + limit})
+    except Exception as e:
+        logging.error(f"Error in startup_candidates: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
 @app.route('/search', methods=['GET'])
 def search():
     """Main search endpoint"""
@@ -697,8 +860,13 @@ def search():
 
         search_type = request.args.get('type', 'hybrid')
         limit = int(request.args.get('limit', 10))
+        exact = request.args.get('exact', 'false').lower() == 'true'
+        k = request.args.get('k', type=int)
+        num_candidates = request.args.get('num_candidates', type=int)
+        # e.g. fields=user_id,name,major,university to get slim cards
+        fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()]
 
-        results = search_manager.search(query, search_type, limit)
+        results = search_manager.search(query, search_type, limit, exact, k, num_candidates, fields)
         return jsonify({
             "success": True,
             "results": results
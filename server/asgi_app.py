@@ -0,0 +1,217 @@
+"""
+Async serving mode: uvicorn asgi_app:api --host 0.0.0.0 --port 8000
+
+The Q&A and search endpoints run on async Supabase / Elasticsearch / OpenAI
+clients, so an /ask_stream connection waiting on the LLM holds a coroutine
+instead of an OS thread. Every other route is the Flask app, mounted as WSGI.
+"""
+import logging
+import math
+import os
+from contextlib import asynccontextmanager
+from elasticsearch import AsyncElasticsearch
+from fastapi import Depends, FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.wsgi import WSGIMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from app import (
+    app as flask_app,
+    ELASTICSEARCH_URL,
+    assemble_founder_context,
+    founder_context_cache,
+    qa_system,
+    query_embedding_cache,
+    rate_limiter,
+    response_cache,
+    search_manager,
+    startup_cards,
+)
+from infrastructure.cofounders import parse_cofounder_ids
+from infrastructure.rate_limiter import client_address
+from infrastructure.supabase_inf import Async_Supabase_Infrastructure
+from infrastructure.sse import astream_sse, areplay
+
+clients = {}
+
+
+@asynccontextmanager
+async def lifespan(api):
+    clients["supabase"] = await Async_Supabase_Infrastructure.create()
+    clients["es"] = AsyncElasticsearch(
+        [ELASTICSEARCH_URL],
+        api_key=os.getenv("ELASTICSEARCH_API_KEY"),
+        verify_certs=False,
+        request_timeout=30,
+        max_retries=3,
+        retry_on_timeout=True
+    )
+    yield
+    await clients["es"].close()
+
+
+api = FastAPI(lifespan=lifespan)
+api.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+
+
+@api.exception_handler(RateLimited)
+async def rate_limited(request: Request, exc: RateLimited):
+    return JSONResponse(
+        {"success": False, "error": "Rate limit exceeded"},
+        status_code=429,
+        headers={"Retry-After": str(math.ceil(exc.retry_after))}
+    )
+
+
+async def limit_requests(request: Request):
+    """Same token buckets as the Flask before_request hook"""
+    client_id = client_address(request.client.host if request.client else None,
+                               request.headers.get("x-forwarded-for", ""))
+    # The Redis backend is a blocking round trip, keep it off the event loop
+    retry_after = await run_in_threadpool(rate_limiter.check, client_id, request.url.path)
+    if retry_after is not None:
+        raise RateLimited(retry_after)
+
+
+async def aload_founder_context(startup_id):
+    """Async twin of app.load_founder_context, sharing its cache"""
+    context = founder_context_cache.get(str(startup_id))
+    if context is not None:
+        return context
+
+    # Materialized card first; only a startup the store has not seen yet is joined here
+    card = startup_cards.peek(startup_id)
+    if card is not None:
+        context = assemble_founder_context(card, card["cofounders"])
+        if context["founders"]:
+            founder_context_cache.set(str(startup_id), context)
+        return context
+
+    supabase = clients["supabase"]
+    startup = await supabase.get_startup_by_id(startup_id)
+    if not startup:
+        return None
+
+    # One query for every cofounder, kept in the order the startup lists them
+    cofounder_ids = parse_cofounder_ids(startup.get('cofounders'))
+    users = {int(user['user_id']): user for user in await supabase.get_users_by_ids(cofounder_ids)}
+
+    context = assemble_founder_context(startup, [users[user_id] for user_id in cofounder_ids if user_id in users])
+    if context["founders"]:
+        founder_context_cache.set(str(startup_id), context)
+    return context
+
+
+def context_error(context):
+    if context is None:
+        return JSONResponse({"error": "Startup not found"}, status_code=404)
+    if not context["founders"]:
+        return JSONResponse({"error": "No founders found for this startup"}, status_code=404)
+    return None
+
+
+@api.post("/ask/{startup_id}", dependencies=[Depends(limit_requests)])
+async def ask(startup_id: str, request: Request):
+    try:
+        body = await request.json()
+        question = body.get('question', '')
+        if not question:
+            return JSONResponse({"error": "Question is required"}, status_code=400)
+
+        context = await aload_founder_context(startup_id)
+        error = context_error(context)
+        if error:
+            return error
+
+        vector = None
+        if response_cache:
+            answer, vector = await response_cache.alookup(startup_id, context["context_hash"], question)
+            if answer is not None:
+                return {"answer": answer, "startup": context["name"], "cached": True}
+
+        response = await qa_system.aask_about_founders(context, question)
+        if response_cache:
+            response_cache.store(startup_id, context["context_hash"], question, vector, response.content)
+        return {"answer": response.content, "startup": context["name"]}
+
+    except Exception as e:
+        logging.error(f"Error in ask endpoint: {str(e)}")
+        return JSONResponse({"error": "Internal server error"}, status_code=500)
+
+
+@api.api_route("/ask_stream/{startup_id}", methods=["GET", "POST"], dependencies=[Depends(limit_requests)])
+async def ask_stream(startup_id: str, request: Request):
+    try:
+        # Handle both GET (query param) and POST (JSON body or form) requests
+        if request.method == "GET":
+            question = request.query_params.get('query', '')
+        elif request.headers.get("content-type", "").startswith("application/json"):
+            question = (await request.json()).get('question', '')
+        else:
+            question = (await request.form()).get('query', '')
+
+        if not question:
+            return JSONResponse({"error": "Question is required"}, status_code=400)
+
+        context = await aload_founder_context(startup_id)
+        error = context_error(context)
+        if error:
+            return error
+
+        if response_cache:
+            answer, vector = await response_cache.alookup(startup_id, context["context_hash"], question)
+            if answer is not None:
+                # Replay the cached answer through the same SSE framing
+                return StreamingResponse(
+                    astream_sse(areplay(answer), label=f"{startup_id} (cached)"),
+                    media_type="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "Connection": "keep-alive"}
+                )
+
+        def remember(answer):
+            if response_cache:
+                response_cache.store(startup_id, context["context_hash"], question, vector, answer)
+
+        chunks = qa_system.astream_about_founders(context, question)
+        return StreamingResponse(
+            astream_sse(chunks, label=str(startup_id), is_disconnected=request.is_disconnected, on_complete=remember),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "Connection": "keep-alive"}
+        )
+
+    except Exception as e:
+        logging.error(f"Endpoint error: {str(e)}")
+        return JSONResponse({"error": "Internal server error"}, status_code=500)
+
+
+@api.get("/search", dependencies=[Depends(limit_requests)])
+async def search(q: str = None, type: str = "hybrid", limit: int = 10, exact: bool = False,
+                 k: int = None, num_candidates: int = None, fields: str = ""):
+    """Main search endpoint, same parameters and response as the Flask one"""
+    try:
+        if not q:
+            return JSONResponse({"error": "Query parameter 'q' is required"}, status_code=400)
+        field_list = [f.strip() for f in fields.split(',') if f.strip()]
+
+        query_embedding = None if type == "text" else await query_embedding_cache.aembed(q)
+        if search_manager.local_backend:
+            results = search_manager.local_backend.search(q, query_embedding, type, limit, field_list)
+        else:
+            searches = search_manager.plan_search(q, query_embedding, type, limit, exact, k, num_candidates)
+            response = await clients["es"].msearch(body=search_manager.msearch_body(searches, field_list))
+            hits, partial = search_manager.parse_msearch(searches, response["responses"])
+            results = search_manager.finish_search(type, hits, partial, limit)
+
+        return {"success": True, "results": results}
+    except Exception as e:
+        logging.error(f"Search failed: {str(e)}")
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+
+
+# Everything else (swipe decks, startup detail, reindex, health...) is served by Flask
+api.mount("/", WSGIMiddleware(flask_app))
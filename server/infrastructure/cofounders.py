@@ -0,0 +1,10 @@
+def parse_cofounder_ids(cofounders):
+    """Parse a cofounders string like "(2, 1482)" into a list of user ids"""
+    if not cofounders:
+        return []
+    if isinstance(cofounders, (list, tuple)):
+        parts = [str(part) for part in cofounders]
+    else:
+        parts = str(cofounders).strip().strip("()[]{}").split(',')
+    return [int(part.strip()) for part in parts if part.strip().isdigit()]
+
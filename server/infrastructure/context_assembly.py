@@ -0,0 +1,103 @@
+import re
+from langchain.schema import Document
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken missing or its encoding cannot be downloaded
+    _ENCODING = None
+
+_TOKEN = re.compile(r"\w+")
+
+
+def count_tokens(text: str) -> int:
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return max(1, len(text) // 4)
+
+
+def _terms(text: str):
+    return set(_TOKEN.findall(text.lower()))
+
+
+class ContextAssembler:
+    """
+    Turns retriever hits into a bounded prompt context.
+
+    Candidates are deduplicated by user id, reranked by a blend of the
+    retriever score and query-term overlap, split into chunks of about
+    `chunk_tokens`, and the best chunks are added until `token_budget`
+    is spent (at most `max_chunks_per_user` per candidate).
+    """
+
+    def __init__(self, token_budget: int = 6000, chunk_tokens: int = 600,
+                 max_chunks_per_user: int = 2, lexical_weight: float = 0.3):
+        self.token_budget = token_budget
+        self.chunk_tokens = chunk_tokens
+        self.max_chunks_per_user = max_chunks_per_user
+        self.lexical_weight = lexical_weight
+
+    def chunk(self, text: str):
+        """Split on blank lines/lines, packing paragraphs into ~chunk_tokens pieces"""
+        paragraphs = []
+        for paragraph in (p.strip() for p in re.split(r"\n\s*\n|\n", text)):
+            tokens = count_tokens(paragraph)
+            if tokens <= self.chunk_tokens:
+                paragraphs.append(paragraph)
+                continue
+            # A single oversized paragraph is cut into word windows of about chunk_tokens
+            words = paragraph.split()
+            step = max(1, int(len(words) * self.chunk_tokens / tokens))
+            paragraphs.extend(" ".join(words[i:i + step]) for i in range(0, len(words), step))
+
+        chunks, current, size = [], [], 0
+        for paragraph in paragraphs:
+            if not paragraph:
+                continue
+            tokens = count_tokens(paragraph)
+            if current and size + tokens > self.chunk_tokens:
+                chunks.append("\n".join(current))
+                current, size = [], 0
+            current.append(paragraph)
+            size += tokens
+        if current:
+            chunks.append("\n".join(current))
+        return chunks
+
+    def _overlap(self, query_terms, text):
+        return len(query_terms & _terms(text)) / len(query_terms) if query_terms else 0.0
+
+    def assemble(self, query: str, documents):
+        # Keep the best hit per user
+        best = {}
+        for doc in documents:
+            user_id = doc.metadata.get("id")
+            if user_id not in best or doc.metadata.get("score", 0) > best[user_id].metadata.get("score", 0):
+                best[user_id] = doc
+        if not best:
+            return []
+
+        # Rerank: min-max normalized retriever score blended with term overlap
+        query_terms = _terms(query)
+        scores = [doc.metadata.get("score", 0.0) for doc in best.values()]
+        low, high = min(scores), max(scores)
+        ranked = []
+        for doc in best.values():
+            vector = (doc.metadata.get("score", 0.0) - low) / (high - low) if high > low else 1.0
+            lexical = self._overlap(query_terms, doc.page_content)
+            ranked.append(((1 - self.lexical_weight) * vector + self.lexical_weight * lexical, doc))
+        ranked.sort(key=lambda item: item[0], reverse=True)
+
+        # Fill the budget with each candidate's most relevant chunks
+        context, spent = [], 0
+        for score, doc in ranked:
+            chunks = sorted(self.chunk(doc.page_content), key=lambda c: self._overlap(query_terms, c), reverse=True)
+            for position, text in enumerate(chunks[:self.max_chunks_per_user]):
+                tokens = count_tokens(text)
+                if spent + tokens > self.token_budget:
+                    continue
+                spent += tokens
+                context.append(Document(page_content=text, metadata={**doc.metadata, "rerank_score": score, "chunk": position}))
+            if spent >= self.token_budget:
+                break
+        return context
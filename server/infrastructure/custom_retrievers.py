@@ -8,34 +8,60 @@ from langchain.schema.retriever import BaseRetriever
 from pydantic import Field, PrivateAttr
 import numpy as np
 import openai
+from context_assembly import ContextAssembler
 load_dotenv()
 openai_api_key = os.environ["OPEN_AI_API_KEY"]
 openai.api_key = openai_api_key
 class CustomElasticsearchResumeRetriever(BaseRetriever):
     index_name: str = Field(...)
     top_k: int = Field(default=5)
+    num_candidates: int = Field(default=200)
+    exact: bool = Field(default=False)
     _es_client: Elasticsearch = PrivateAttr()
-    def __init__(self, es_client: Elasticsearch, index_name:str,  top_k: int = 50):
-        super().__init__(index_name=index_name, top_k=top_k)
+    _local_index = PrivateAttr(default=None)
+    _embedder = PrivateAttr(default=None)
+    def __init__(self, es_client: Elasticsearch, index_name:str,  top_k: int = 50,
+                 num_candidates: int = 200, exact: bool = False, local_index=None, embedder=None):
+        super().__init__(index_name=index_name, top_k=top_k, num_candidates=num_candidates, exact=exact)
         self._es_client = es_client
+        self._local_index = local_index  # optional NumpyVectorIndex, replaces the cluster
+        self._embedder = embedder  # optional QueryEmbeddingCache, repeated queries skip the API
         self.index_name = index_name
         self.top_k = top_k
 
     def _get_relevant_documents(self, query: str):
-        embedding = openai.embeddings.create(input=query, model="text-embedding-3-small").data[0].embedding
+        if self._embedder is not None:
+            embedding = self._embedder.embed(query)
+        else:
+            embedding = openai.embeddings.create(input=query, model="text-embedding-3-small").data[0].embedding
+        if self._local_index is not None:
+            return [
+                Document(page_content=hit['_source'].get("resume", ""), metadata={"score": hit['_score'], "id": hit['_id']})
+                for hit in self._local_index.search(embedding, self.top_k)
+            ]
         es_query = {
         "_source": {"exclude": ["resume_embedding"]},  # Exclude full vector from results
-        "query": {
-            "script_score": {
-                "query": {"match_all": {}},  # Baseline query (can add filters here)
-                "script": {
-                    "source": "cosineSimilarity(params.query_vector, 'resume_embedding') + 1.0",
-                    "params": {"query_vector": embedding}
-                }
-            }
-        },
         "size": self.top_k
     }
+        if self.exact:
+            # Brute-force scoring of every document, only for small indices or recall checks
+            es_query["query"] = {
+                "script_score": {
+                    "query": {"match_all": {}},  # Baseline query (can add filters here)
+                    "script": {
+                        "source": "cosineSimilarity(params.query_vector, 'resume_embedding') + 1.0",
+                        "params": {"query_vector": embedding}
+                    }
+                }
+            }
+        else:
+            # Approximate HNSW search, latency stays flat as the index grows
+            es_query["knn"] = {
+                "field": "resume_embedding",
+                "query_vector": embedding,
+                "k": self.top_k,
+                "num_candidates": max(self.num_candidates, self.top_k)
+            }
 
         # Execute the search
         response = self._es_client.search(index=self.index_name, body=es_query)
@@ -52,6 +78,14 @@ class CustomElasticsearchResumeRetriever(BaseRetriever):
         return documents
 
 
+class BudgetedRetriever(BaseRetriever):
+    """Wraps a retriever so the documents handed to a stuff chain fit a token budget"""
+    _base: BaseRetriever = PrivateAttr()
+    _assembler: ContextAssembler = PrivateAttr()
+    def __init__(self, base: BaseRetriever, assembler: ContextAssembler = None):
+        super().__init__()
+        self._base = base
+        self._assembler = assembler or ContextAssembler()
 
-        
-    
\ No newline at end of file
+    def _get_relevant_documents(self, query: str):
+        return self._assembler.assemble(query, self._base._get_relevant_documents(query))
@@ -0,0 +1,116 @@
+import logging
+import os
+import pickle
+import threading
+import time
+try:
+    from infrastructure.ttl_cache import TTLCache
+except ImportError:  # imported from inside infrastructure/ (LangChain_Inf)
+    from ttl_cache import TTLCache
+
+
+class QueryEmbeddingCache:
+    """
+    LRU+TTL cache of normalized query text -> embedding vector.
+
+    When `path` is given the cache is loaded from it on start-up and written
+    back (atomically) by a background thread every `save_every` new
+    entries, and on `save()`, so popular queries survive restarts without
+    a request ever waiting for the pickle. The file records `namespace` (the
+    vector profile's model and dims); a file written under another one is
+    discarded instead of serving vectors of the wrong model or size.
+    """
+
+    def __init__(self, embeddings, maxsize: int = 4096, ttl: float = 7 * 24 * 3600,
+                 path: str = None, save_every: int = 50, namespace: str = None):
+        self.embeddings = embeddings
+        self.namespace = namespace or getattr(embeddings, "model", None) or type(embeddings).__name__
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.path = path
+        self.save_every = save_every
+        self._unsaved = 0
+        self._unsaved_lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._save_wanted = threading.Event()
+        if path:
+            self.load()
+            threading.Thread(target=self._run_saver, daemon=True).start()
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    def embed(self, query: str):
+        key = self.normalize(query)
+        vector = self.cache.get(key)
+        if vector is not None:
+            return vector
+        vector = self.embeddings.embed_query(key)
+        self.cache.set(key, vector)
+        self._added()
+        return vector
+
+    async def aembed(self, query: str):
+        """Async variant of `embed` for the ASGI app"""
+        key = self.normalize(query)
+        vector = self.cache.get(key)
+        if vector is not None:
+            return vector
+        vector = await self.embeddings.aembed_query(key)
+        self.cache.set(key, vector)
+        # Never pickles on the event loop, the saver thread does
+        self._added()
+        return vector
+
+    def _added(self):
+        """Count a new entry; every `save_every` of them wake the saver thread"""
+        with self._unsaved_lock:
+            self._unsaved += 1
+            due = self._unsaved >= self.save_every
+        if due and self.path:
+            self._save_wanted.set()
+
+    def _run_saver(self):
+        while True:
+            self._save_wanted.wait()
+            self._save_wanted.clear()
+            try:
+                self.save()
+            except Exception as e:
+                logging.error(f"Could not save query embedding cache {self.path}: {str(e)}")
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "rb") as file:
+                saved = pickle.load(file)
+        except Exception as e:
+            logging.error(f"Could not load query embedding cache {self.path}: {str(e)}")
+            return
+        if not isinstance(saved, dict) or saved.get("namespace") != self.namespace:
+            logging.info(f"Discarding query embedding cache {self.path}: not written for {self.namespace}")
+            return
+        now = time.time()
+        for key, vector, expires_at in saved["entries"]:
+            if expires_at > now:
+                self.cache.set(key, vector, ttl=expires_at - now)
+        logging.info(f"Loaded {len(self.cache)} cached query embeddings")
+
+    def save(self):
+        if not self.path:
+            return
+        with self._save_lock:
+            # Entries added while pickling count towards the next save
+            with self._unsaved_lock:
+                self._unsaved = 0
+            now = time.time()
+            entries = [(key, vector, now + ttl_left) for key, vector, ttl_left in self.cache.items()]
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "wb") as file:
+                pickle.dump({"namespace": self.namespace, "entries": entries}, file,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+
+    def stats(self):
+        return self.cache.stats()
@@ -0,0 +1,197 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import numpy as np
+
+# Rows added to the memory map whenever it runs full
+GROW_ROWS = 4096
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Persistent (model, content hash) -> vector store in front of an embeddings client.
+
+    Vectors of one model live in `<model>.vectors.f32`, a float32 memory map
+    grown in GROW_ROWS steps, and `<model>.index.log` appends one
+    "hash row" line per vector, written after the vector itself, so a crash
+    never leaves an entry pointing at an unwritten row. Several processes
+    may share a directory: appends are serialized with `flock`. The model name
+    (plus `dimensions`, when the client shortens embeddings) picks the files,
+    so vectors of different models never mix.
+
+    It exposes `embed_documents` / `embed_query` / `aembed_query` like a
+    LangChain embeddings object, so the indexing pipeline and the offline
+    jobs use it unchanged: only text never seen before is sent to the API.
+    It is meant for indexed content; free-text queries belong in the
+    bounded QueryEmbeddingCache.
+    """
+
+    def __init__(self, directory: str, embeddings, model: str = None):
+        self.embeddings = embeddings
+        model = model or getattr(embeddings, "model", None) or type(embeddings).__name__
+        dimensions = getattr(embeddings, "dimensions", None)
+        self.model = f"{model}-{dimensions}" if dimensions else model
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", self.model)
+        os.makedirs(directory, exist_ok=True)
+        self.vectors_path = os.path.join(directory, f"{slug}.vectors.f32")
+        self.index_path = os.path.join(directory, f"{slug}.index.log")
+        self.meta_path = os.path.join(directory, f"{slug}.meta.json")
+        self.lock_path = os.path.join(directory, f"{slug}.lock")
+        self.hits = 0
+        self.misses = 0
+        self._rows = {}
+        self._next_row = 0
+        self._log_offset = 0
+        self._dims = None
+        self._capacity = 0
+        self._vectors = None
+        self._lock = threading.Lock()
+        with self._lock:
+            self._sync()
+        if self._rows:
+            logging.info(f"Loaded {len(self._rows)} stored {self.model} embeddings")
+
+    def _sync(self):
+        """Pick up rows other processes appended since the last call; caller holds the lock"""
+        if self._dims is None:
+            if not os.path.exists(self.meta_path):
+                return
+            with open(self.meta_path, encoding="utf-8") as file:
+                self._dims = json.load(file)["dims"]
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "rb") as file:
+                file.seek(self._log_offset)
+                tail = file.read()
+            # A line still being written by another process is read next time
+            complete = tail[:tail.rfind(b"\n") + 1]
+            self._log_offset += len(complete)
+            for line in complete.decode("utf-8").splitlines():
+                parts = line.split()
+                if len(parts) == 2:
+                    row = int(parts[1])
+                    self._rows[parts[0]] = row
+                    self._next_row = max(self._next_row, row + 1)
+        size = os.path.getsize(self.vectors_path) // (4 * self._dims) if os.path.exists(self.vectors_path) else 0
+        if size > self._capacity or self._next_row > self._capacity:
+            self._open(max(size, self._next_row))
+
+    def _open(self, capacity):
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(self.vectors_path, "ab") as file:
+            if file.tell() < capacity * self._dims * 4:
+                file.truncate(capacity * self._dims * 4)
+        self._capacity = capacity
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+",
+                                  shape=(capacity, self._dims)) if capacity else None
+
+    def _put(self, keys, vectors):
+        """
+        Append new vectors; caller holds the lock. Other processes may share
+        the directory, so rows are assigned under an exclusive `flock` on
+        the lock file, after catching up with everything they appended.
+        """
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._sync()
+                if self._dims is None:
+                    self._dims = len(vectors[0])
+                    with open(self.meta_path, "w", encoding="utf-8") as file:
+                        json.dump({"model": self.model, "dims": self._dims}, file)
+                fresh = {}
+                for key, vector in zip(keys, vectors):
+                    if key not in self._rows and key not in fresh:
+                        fresh[key] = vector
+                if not fresh:
+                    return
+                start = self._next_row
+                if start + len(fresh) > self._capacity:
+                    self._open(start + len(fresh) + GROW_ROWS)
+                self._vectors[start:start + len(fresh)] = np.asarray(list(fresh.values()), dtype=np.float32)
+                self._vectors.flush()
+                lines = "".join(f"{key} {row}\n" for row, key in enumerate(fresh, start)).encode("utf-8")
+                with open(self.index_path, "ab+") as file:
+                    end = file.seek(0, os.SEEK_END)
+                    if end:
+                        file.seek(end - 1)
+                        if file.read(1) != b"\n":
+                            # Terminate a line left half-written by a crashed writer
+                            lines = b"\n" + lines
+                    file.write(lines)
+                for row, key in enumerate(fresh, start):
+                    self._rows[key] = row
+                self._next_row = start + len(fresh)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def get(self, key):
+        row = self._rows.get(key)
+        return None if row is None else self._vectors[row].tolist()
+
+    def embed_documents(self, texts):
+        keys = [text_key(text) for text in texts]
+        with self._lock:
+            if any(key not in self._rows for key in keys):
+                self._sync()
+            found = {key: self.get(key) for key in keys if key in self._rows}
+        missing = list({key: text for key, text in zip(keys, texts) if key not in found}.items())
+        if missing:
+            vectors = self.embeddings.embed_documents([text for _, text in missing])
+            with self._lock:
+                self._put([key for key, _ in missing], vectors)
+            found.update(zip((key for key, _ in missing), vectors))
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str):
+        return self.embed_documents([text])[0]
+
+    async def aembed_query(self, text: str):
+        key = text_key(text)
+        with self._lock:
+            vector = self.get(key)
+            if vector is not None:
+                self.hits += 1
+                return vector
+        vector = await self.embeddings.aembed_query(text)
+        with self._lock:
+            self._put([key], [vector])
+            self.misses += 1
+        return vector
+
+    def __len__(self):
+        return len(self._rows)
+
+    def stats_since(self, before):
+        """Hits and misses since an earlier `stats()` snapshot, e.g. for one reindex run"""
+        hits, misses = self.hits - before["hits"], self.misses - before["misses"]
+        return {
+            "model": self.model,
+            "vectors": len(self._rows),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        }
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "model": self.model,
+            "vectors": len(self._rows),
+            "dims": self._dims,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from elasticsearch import helpers
+from infrastructure.supabase_inf import Supabase_Infrastructure
+
+
+def iter_table(supabase_inf: Supabase_Infrastructure, table: str, id_column: str,
+               columns: str = "*", page_size: int = 500):
+    """Yield every row of a Supabase table, one page at a time"""
+    start = 0
+    while True:
+        page = supabase_inf.client.table(table) \
+            .select(columns) \
+            .order(id_column) \
+            .range(start, start + page_size - 1) \
+            .execute()
+        rows = page.data or []
+        yield from rows
+        if len(rows) < page_size:
+            return
+        start += page_size
+
+
+def iter_batches(rows, batch_size: int):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def content_hash(text) -> str:
+    """Hash of the text that gets embedded; a change means the vector must be recomputed"""
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def row_hash(row) -> str:
+    """Hash of the whole Supabase row; a change means the document must be rewritten"""
+    return hashlib.sha256(json.dumps(row, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class IndexingPipeline:
+    """
+    Streaming Supabase -> embeddings -> Elasticsearch indexer.
+
+    Rows are paged from Supabase, embedded `batch_size` at a time with
+    `embed_documents` on up to `max_workers` concurrent requests, and fed
+    as a generator into `helpers.streaming_bulk`, so neither the corpus
+    nor its vectors are ever held in memory all at once.
+    """
+
+    def __init__(self, es, embeddings, supabase_inf: Supabase_Infrastructure = None,
+                 batch_size: int = 64, max_workers: int = 4, page_size: int = 500,
+                 bulk_chunk_size: int = 200, encode=None):
+        self.es = es
+        self.embeddings = embeddings
+        self.supabase = supabase_inf or Supabase_Infrastructure()
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.page_size = page_size
+        self.bulk_chunk_size = bulk_chunk_size
+        # Maps an embedding to the stored value, e.g. byte quantization (see vector_profile.py)
+        self.encode = encode or (lambda vector: vector)
+
+    def _embed(self, batch, text_field):
+        # The embeddings API rejects empty strings
+        texts = [(row.get(text_field) or "").strip() or " " for row in batch]
+        return batch, self.embeddings.embed_documents(texts)
+
+    def embed_rows(self, rows, text_field: str):
+        """Yield (row, vector) pairs in input order, keeping at most 2 * max_workers batches in flight"""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            in_flight = deque()
+            for batch in iter_batches(rows, self.batch_size):
+                in_flight.append(executor.submit(self._embed, batch, text_field))
+                if len(in_flight) >= 2 * self.max_workers:
+                    yield from zip(*in_flight.popleft().result())
+            while in_flight:
+                yield from zip(*in_flight.popleft().result())
+
+    def _actions(self, rows, index, id_column, text_field, vector_field):
+        for row, vector in self.embed_rows(rows, text_field):
+            yield {
+                "_index": index,
+                "_id": row[id_column],
+                "_source": {
+                    **row,
+                    vector_field: self.encode(vector),
+                    "content_hash": content_hash(row.get(text_field)),
+                    "row_hash": row_hash(row)
+                }
+            }
+
+    def existing_hashes(self, index: str):
+        """Map document id -> (content_hash, row_hash) for everything currently in `index`"""
+        if not self.es.indices.exists(index=index):
+            return {}
+        hashes = {}
+        for hit in helpers.scan(self.es, index=index, query={"query": {"match_all": {}}},
+                                _source=["content_hash", "row_hash"], size=1000):
+            source = hit.get("_source", {})
+            hashes[hit["_id"]] = (source.get("content_hash"), source.get("row_hash"))
+        return hashes
+
+    def _incremental_actions(self, rows, index, id_column, text_field, vector_field, counts):
+        existing = self.existing_hashes(index)
+        seen = set()
+        updates = []
+
+        def rows_to_embed():
+            for row in rows:
+                doc_id = str(row[id_column])
+                seen.add(doc_id)
+                old_content, old_row = existing.get(doc_id, (None, None))
+                if old_content != content_hash(row.get(text_field)):
+                    counts["embedded"] += 1
+                    yield row
+                elif old_row != row_hash(row):
+                    # Text unchanged: rewrite the other fields but keep the stored vector
+                    updates.append(row)
+                else:
+                    counts["unchanged"] += 1
+
+        yield from self._actions(rows_to_embed(), index, id_column, text_field, vector_field)
+
+        for row in updates:
+            counts["updated"] += 1
+            yield {
+                "_op_type": "update",
+                "_index": index,
+                "_id": row[id_column],
+                "doc": {**row, "row_hash": row_hash(row)}
+            }
+        for doc_id in existing.keys() - seen:
+            counts["deleted"] += 1
+            yield {"_op_type": "delete", "_index": index, "_id": doc_id}
+
+    def run_bulk(self, actions, label: str):
+        """Feed an action generator to streaming_bulk and report throughput"""
+        started = time.perf_counter()
+        indexed = failed = 0
+        for ok, item in helpers.streaming_bulk(self.es, actions, chunk_size=self.bulk_chunk_size,
+                                               raise_on_error=False, max_retries=3):
+            if ok:
+                indexed += 1
+            else:
+                failed += 1
+                logging.error(f"Failed to index {label} document: {item}")
+        elapsed = time.perf_counter() - started
+        stats = {
+            "indexed": indexed,
+            "failed": failed,
+            "seconds": round(elapsed, 2),
+            "docs_per_second": round(indexed / elapsed, 1) if elapsed else 0.0,
+        }
+        logging.info(f"Indexed {indexed} {label} ({failed} failed) in {stats['seconds']}s, "
+                     f"{stats['docs_per_second']} docs/s")
+        return stats
+
+    def index_table(self, table: str, id_column: str, index: str, text_field: str, vector_field: str):
+        """Re-embed and index every row of `table`; returns throughput stats"""
+        rows = iter_table(self.supabase, table, id_column, page_size=self.page_size)
+        return self.run_bulk(self._actions(rows, index, id_column, text_field, vector_field), table)
+
+    def index_table_incremental(self, table: str, id_column: str, index: str, text_field: str, vector_field: str):
+        """
+        Only re-embed rows whose embedded text changed, partially update rows
+        whose other fields changed, and delete documents whose row is gone.
+        """
+        counts = {"embedded": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+        rows = iter_table(self.supabase, table, id_column, page_size=self.page_size)
+        stats = self.run_bulk(self._incremental_actions(rows, index, id_column, text_field, vector_field, counts), table)
+        return {**stats, **counts}
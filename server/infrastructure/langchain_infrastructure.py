@@ -3,12 +3,18 @@ import os
 from dotenv import load_dotenv
 import torch
 import json
-from custom_retrievers import CustomElasticsearchResumeRetriever
+from custom_retrievers import CustomElasticsearchResumeRetriever, BudgetedRetriever
+from context_assembly import ContextAssembler
 from langchain_openai import ChatOpenAI
 from langchain.chains import RetrievalQA, LLMChain
 from langchain.prompts import PromptTemplate
 from langchain.chains.combine_documents.stuff import StuffDocumentsChain
 from elasticsearch_inf import Elasticsearch_Inf
+from ttl_cache import TTLCache
+from embedding_cache import QueryEmbeddingCache
+from vector_profile import RESUME_PROFILE
+from vector_index import NumpyVectorIndex
+from concurrent.futures import ThreadPoolExecutor
 import openai
 os.environ["OPENAI_API_KEY"] = os.getenv("OPEN_AI_API_KEY")
 load_dotenv()
@@ -43,12 +49,41 @@ As an AI assistant you have no power of negotiating or doing a task besides answ
 Answer:
 """
 
+# Only the profile fields qa_user_id reads, never the embedding
+PROFILE_FIELDS = ["resume", "about_me"]
+
+
+def _doc_version(doc):
+    """Changes on every write to the document, including a reindex from another process"""
+    return doc.get("_seq_no"), doc.get("_primary_term")
+
 elasticsearch_inf = Elasticsearch_Inf()
 class LangChain_Inf:
     def __init__(self):
         self.client = elasticsearch_inf.client
-        self.resume_retriever = CustomElasticsearchResumeRetriever(self.client, "user_index3")
-        self.user_profile_retriever = CustomElasticsearchResumeRetriever(self.client, "user_index3")
+        # user_id -> (document version, {"resume", "about_me"}); hits are checked against the live
+        # version, so a reindex of user_index3 is seen immediately, not after PROFILE_CACHE_TTL
+        self.profile_cache = TTLCache(maxsize=2048, ttl=int(os.getenv("PROFILE_CACHE_TTL", 600)))
+        # resume_embedding's model, which VECTOR_PROFILE does not change; questions live in a
+        # bounded TTL cache, never in the document store
+        embedder = QueryEmbeddingCache(RESUME_PROFILE.embeddings(),
+                                       maxsize=int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 4096)),
+                                       namespace=RESUME_PROFILE.key)
+        # SEARCH_BACKEND=numpy: resume_embedding exported by vector_index.py, no cluster round trip
+        local_index = None
+        if os.getenv("SEARCH_BACKEND", "elasticsearch") == "numpy":
+            local_index = NumpyVectorIndex.load(
+                os.path.join(os.getenv("LOCAL_INDEX_DIR", os.path.join("..", "data", "vector_index")), "resumes"),
+                RESUME_PROFILE.dims)
+        retriever_options = {"embedder": embedder, "local_index": local_index}
+        self.resume_retriever = CustomElasticsearchResumeRetriever(self.client, "user_index3", **retriever_options)
+        self.user_profile_retriever = CustomElasticsearchResumeRetriever(self.client, "user_index3", **retriever_options)
+        # The RAG chains see a small reranked candidate pool trimmed to a token budget, not 50 full resumes
+        assembler = ContextAssembler(token_budget=int(os.getenv("RAG_CONTEXT_TOKENS", 6000)))
+        self.resume_context_retriever = BudgetedRetriever(
+            CustomElasticsearchResumeRetriever(self.client, "user_index3", top_k=20, **retriever_options), assembler)
+        self.user_profile_context_retriever = BudgetedRetriever(
+            CustomElasticsearchResumeRetriever(self.client, "user_index3", top_k=20, **retriever_options), assembler)
 
         self.setup_chains()
        
@@ -79,11 +114,11 @@ class LangChain_Inf:
         self.chain_dict = {
             "resume_chain": RetrievalQA(
                 combine_documents_chain=self.stuff_resume_chain,
-                retriever=self.resume_retriever
+                retriever=self.resume_context_retriever
             ),
              "about_me_chain": RetrievalQA(
                 combine_documents_chain=self.stuff_user_profile_chain,
-                retriever=self.user_profile_retriever
+                retriever=self.user_profile_context_retriever
             )
         }
 
@@ -114,15 +149,61 @@ class LangChain_Inf:
         out = chain.run(query)
         return out
     
-    def qa_user_id(self, query, user_id):
+    def get_profile(self, user_id):
+        """Resume and about_me of one user; a cached copy costs one source-free get to validate"""
+        cached = self.profile_cache.get(str(user_id))
+        if cached is not None:
+            head = self.client.get(index="user_index3", id=user_id, _source=False)
+            if _doc_version(head) == cached[0]:
+                return cached[1]
+        doc = self.client.get(index="user_index3", id=user_id, _source_includes=PROFILE_FIELDS)
+        profile = {field: doc["_source"].get(field) for field in PROFILE_FIELDS}
+        self.profile_cache.set(str(user_id), (_doc_version(doc), profile))
+        return profile
 
-        resume  = self.client.get(index="user_index3", id=user_id)["_source"].get("resume")
-        about_me = self.client.get(index="user_index3", id=user_id)["_source"].get("about_me")
+    def get_profiles(self, user_ids):
+        """Profiles of many users: one source-free mget validates the cached ones, one mget loads the rest"""
+        profiles = {}
+        cached = {}
+        missing = []
+        for user_id in user_ids:
+            entry = self.profile_cache.get(str(user_id))
+            if entry is None:
+                missing.append(str(user_id))
+            else:
+                cached[str(user_id)] = entry
+        if cached:
+            response = self.client.mget(index="user_index3", ids=list(cached), _source=False)
+            for doc in response["docs"]:
+                version, profile = cached[doc["_id"]]
+                if doc.get("found") and _doc_version(doc) == version:
+                    profiles[doc["_id"]] = profile
+                else:
+                    missing.append(doc["_id"])
+        if missing:
+            response = self.client.mget(index="user_index3", ids=missing, _source_includes=PROFILE_FIELDS)
+            for doc in response["docs"]:
+                if not doc.get("found"):
+                    self.profile_cache.invalidate(doc["_id"])
+                    continue
+                profile = {field: doc["_source"].get(field) for field in PROFILE_FIELDS}
+                self.profile_cache.set(doc["_id"], (_doc_version(doc), profile))
+                profiles[doc["_id"]] = profile
+        return profiles
 
+    def invalidate_profiles(self, user_ids=None):
+        """Forget cached profiles, e.g. to free memory; all of them when no ids are given"""
+        if user_ids is None:
+            self.profile_cache.invalidate()
+            return
+        for user_id in user_ids:
+            self.profile_cache.invalidate(str(user_id))
+
+    def _answer_about_profile(self, query, profile):
         system_prompt = f'''You are a question/answering assistant which will receive questions regarding the resume of a
         user and their about_me section, use that information to answer questions'''
-        user_prompt = f'''Resume: {resume} 
-                        About_me: {about_me}
+        user_prompt = f'''Resume: {profile.get("resume")} 
+                        About_me: {profile.get("about_me")}
                         Question: {query}
 '''
         response = openai.chat.completions.create(
@@ -136,6 +217,16 @@ class LangChain_Inf:
         max_tokens=150
     )
         return response.choices[0].message.content
+
+    def qa_user_id(self, query, user_id):
+        return self._answer_about_profile(query, self.get_profile(user_id))
+
+    def qa_user_ids(self, query, user_ids, max_workers=8):
+        """Ask the same question about many users: one mget, concurrent LLM calls; returns {user_id: answer}"""
+        profiles = self.get_profiles(user_ids)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            answers = executor.map(lambda item: (item[0], self._answer_about_profile(query, item[1])), profiles.items())
+            return dict(answers)
 # Access the "resume" field
         
 
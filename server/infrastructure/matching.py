@@ -0,0 +1,174 @@
+import argparse
+import json
+import logging
+import os
+import time
+import numpy as np
+
+# Query rows scored per matrix product in blocked_top_k: a (BLOCK_ROWS x corpus rows) float32 buffer
+BLOCK_ROWS = 512
+
+MATCH_FIELDS = ["user_id", "major", "university", "is_cofounder"]
+
+
+def _codes(values):
+    """Map categorical strings to int codes; missing values get -1 so they never count as equal"""
+    lookup = {}
+    codes = np.full(len(values), -1, dtype=np.int32)
+    for i, value in enumerate(values):
+        if value:
+            codes[i] = lookup.setdefault(str(value).strip().lower(), len(lookup))
+    return codes
+
+
+def blocked_top_k(queries, corpus, k: int, mask_fn=None, block_rows: int = BLOCK_ROWS):
+    """
+    Return (indices, scores) of the `k` best corpus rows for every query
+    row, best first. `queries @ corpus.T` is computed `block_rows` rows at a
+    time; `mask_fn(block, start, stop)` may adjust a block in place, e.g.
+    set excluded pairs to -inf, before `argpartition` picks its top `k`.
+    """
+    n = len(queries)
+    indices = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=np.float32)
+    for start in range(0, n, block_rows) if k else ():
+        stop = min(start + block_rows, n)
+        block = queries[start:stop] @ corpus.T
+        if mask_fn is not None:
+            mask_fn(block, start, stop)
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(block, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        indices[start:stop] = np.take_along_axis(top, order, axis=1)
+        scores[start:stop] = np.take_along_axis(top_scores, order, axis=1)
+    return indices, scores
+
+
+class MatchingEngine:
+    """
+    Precomputed cofounder neighbor lists over the about_me embeddings.
+
+    Every user is scored against every other user with blocked matrix
+    products over L2-normalized vectors; the cosine similarity is adjusted
+    by `same_major_weight` (negative favors complementary backgrounds) and
+    `same_university_weight`, and with `exclude_cofounders` users who are
+    already cofounders are never suggested. The top `k` of each row are
+    picked with `argpartition` and kept, so serving a user's ranked
+    candidates is an array lookup.
+
+    On disk an engine at `path` is `path.neighbors.npz` and `path.meta.json`.
+    """
+
+    def __init__(self, ids, neighbors, scores, params=None):
+        self.ids = ids
+        self.neighbors = neighbors
+        self.scores = scores
+        self.params = params or {}
+        self._rows = {user_id: row for row, user_id in enumerate(ids)}
+
+    @classmethod
+    def build(cls, ids, vectors, sources, k: int = 100, same_major_weight: float = -0.05,
+              same_university_weight: float = 0.03, exclude_cofounders: bool = False):
+        started = time.perf_counter()
+        n = len(ids)
+        k = max(0, min(k, n - 1))
+        params = {
+            "k": k,
+            "same_major_weight": same_major_weight,
+            "same_university_weight": same_university_weight,
+            "exclude_cofounders": exclude_cofounders,
+        }
+        if not n:
+            return cls([], np.empty((0, 0), dtype=np.int32), np.empty((0, 0), dtype=np.float32), params)
+        matrix = np.array(vectors, dtype=np.float32)
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+        majors = _codes([source.get("major") for source in sources])
+        universities = _codes([source.get("university") for source in sources])
+        cofounder = np.array([bool(source.get("is_cofounder")) for source in sources])
+
+        def adjust(block, start, stop):
+            if same_major_weight:
+                same = (majors[start:stop, None] == majors[None, :]) & (majors[None, :] >= 0)
+                block += same_major_weight * same
+            if same_university_weight:
+                same = (universities[start:stop, None] == universities[None, :]) & (universities[None, :] >= 0)
+                block += same_university_weight * same
+            if exclude_cofounders:
+                block[:, cofounder] = -np.inf
+            block[np.arange(stop - start), np.arange(start, stop)] = -np.inf  # never match yourself
+
+        neighbors, scores = blocked_top_k(matrix, matrix, k, adjust)
+
+        logging.info(f"Matched {n} users (top {k}) in {time.perf_counter() - started:.2f}s")
+        return cls([str(user_id) for user_id in ids], neighbors, scores, params)
+
+    @classmethod
+    def from_elasticsearch(cls, es, index: str = "user_index3", vector_field: str = "about_me_vector", **kwargs):
+        """Build from the vectors the reindex job already stored in ES"""
+        from elasticsearch import helpers
+
+        # Bulk-indexed documents are only visible to the scan after a refresh
+        es.indices.refresh(index=index)
+        ids, vectors, sources = [], [], []
+        for hit in helpers.scan(es, index=index, query={"query": {"match_all": {}}},
+                                _source_includes=MATCH_FIELDS + [vector_field], size=500):
+            source = hit["_source"]
+            vector = source.pop(vector_field, None)
+            if vector is None:
+                continue
+            ids.append(source.get("user_id", hit["_id"]))
+            vectors.append(vector)
+            sources.append(source)
+        return cls.build(ids, vectors, sources, **kwargs)
+
+    @classmethod
+    def from_vector_index(cls, index, **kwargs):
+        """Build from a local NumpyVectorIndex of users (SEARCH_BACKEND=numpy)"""
+        vectors = np.asarray(index.vectors, dtype=np.float32)
+        if index.scales is not None:
+            vectors = vectors * index.scales[:, None]
+        ids = [source.get("user_id", doc_id) for doc_id, source in zip(index.ids, index.sources)]
+        return cls.build(ids, vectors, index.sources, **kwargs)
+
+    def save(self, path):
+        np.savez(f"{path}.neighbors.npz", neighbors=self.neighbors, scores=self.scores)
+        with open(f"{path}.meta.json", "w", encoding="utf-8") as file:
+            json.dump({"ids": self.ids, "params": self.params}, file)
+
+    @classmethod
+    def load(cls, path):
+        arrays = np.load(f"{path}.neighbors.npz")
+        with open(f"{path}.meta.json", encoding="utf-8") as file:
+            meta = json.load(file)
+        return cls(meta["ids"], arrays["neighbors"], arrays["scores"], meta["params"])
+
+    def __contains__(self, user_id):
+        return str(user_id) in self._rows
+
+    def __len__(self):
+        return len(self.ids)
+
+    def candidates(self, user_id, count: int = 25, offset: int = 0):
+        """Return [(candidate user_id, score), ...] ranked best first; [] for an unknown user"""
+        row = self._rows.get(str(user_id))
+        if row is None:
+            return []
+        picked = self.neighbors[row, offset:offset + count]
+        scores = self.scores[row, offset:offset + count]
+        return [(self.ids[i], float(score)) for i, score in zip(picked, scores) if np.isfinite(score)]
+
+
+if __name__ == "__main__":
+    from elasticsearch_inf import client
+
+    parser = argparse.ArgumentParser(description="Precompute cofounder neighbor lists from the user index")
+    parser.add_argument("--out", default=os.path.join("..", "data", "matches", "users"))
+    parser.add_argument("--k", type=int, default=100)
+    parser.add_argument("--exclude-cofounders", action="store_true")
+    args = parser.parse_args()
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+
+    engine = MatchingEngine.from_elasticsearch(client, k=args.k, exclude_cofounders=args.exclude_cofounders)
+    engine.save(args.out)
+    print(f"{len(engine)} users, top {engine.params['k']} neighbors each -> {args.out}")
@@ -0,0 +1,9 @@
+def rrf_fuse(hit_lists, limit, rank_constant=60):
+    """Fuse ranked hit lists by summing 1 / (rank_constant + rank) per document id"""
+    scores, docs = {}, {}
+    for hits in hit_lists:
+        for rank, hit in enumerate(hits, start=1):
+            scores[hit["_id"]] = scores.get(hit["_id"], 0.0) + 1.0 / (rank_constant + rank)
+            docs.setdefault(hit["_id"], hit)
+    ranked = sorted(scores, key=scores.get, reverse=True)[:limit]
+    return [{**docs[doc_id], "_score": scores[doc_id]} for doc_id in ranked]
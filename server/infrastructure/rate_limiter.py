@@ -0,0 +1,138 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    """Token bucket holding up to `capacity` requests, refilled at `rate` tokens per second"""
+    capacity: float
+    rate: float
+
+
+# (path prefix, bucket group, rule), first match wins
+ROUTE_RULES = [
+    ("/ask_stream/", "ask_stream", RateLimitRule(capacity=5, rate=5 / 60)),
+    ("/search/reindex", "reindex", RateLimitRule(capacity=1, rate=1 / 300)),
+    ("/recommendations/rebuild", "recommendations", RateLimitRule(capacity=1, rate=1 / 300)),
+]
+DEFAULT_RULE = RateLimitRule(capacity=30, rate=10)
+EXEMPT_PATHS = ("/test", "/search/health")
+# Reverse proxies in front of the server; X-Forwarded-For is ignored unless this is set
+TRUSTED_PROXIES = int(os.getenv("TRUSTED_PROXIES", 0))
+
+
+def client_address(remote_addr, forwarded_for: str = "", trusted_proxies: int = TRUSTED_PROXIES):
+    """
+    Address the limiter keys on. Like werkzeug's ProxyFix(x_for=n), only the
+    entry appended by the outermost of `trusted_proxies` proxies is used;
+    anything further left was written by the client.
+    """
+    if trusted_proxies:
+        hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+        if len(hops) >= trusted_proxies:
+            return hops[-trusted_proxies]
+    return remote_addr or "unknown"
+
+
+class InMemoryBucketBackend:
+    """
+    Per-process buckets; only correct when the server runs a single worker.
+    Past `max_keys` the least recently used bucket is dropped.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rule: RateLimitRule):
+        """Consume one token; return 0 if allowed, else the seconds until a token is available"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (rule.capacity, now))
+            tokens = min(rule.capacity, tokens + (now - last) * rule.rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                retry_after = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                retry_after = (1 - tokens) / rule.rate
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+
+# Atomic refill-and-take so every worker shares the same bucket
+_REDIS_TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(retry_after)
+"""
+
+
+class RedisBucketBackend:
+    """Buckets stored in Redis, shared by every worker/process"""
+
+    def __init__(self, url: str, prefix: str = "upstarter:ratelimit:"):
+        import redis  # optional dependency, only needed for the shared backend
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._take = self.client.register_script(_REDIS_TAKE_SCRIPT)
+
+    def take(self, key: str, rule: RateLimitRule):
+        result = self._take(keys=[self.prefix + key], args=[rule.capacity, rule.rate, time.time()])
+        return float(result)
+
+
+class RateLimiter:
+    def __init__(self, backend, route_rules=ROUTE_RULES, default_rule=DEFAULT_RULE, exempt_paths=EXEMPT_PATHS):
+        self.backend = backend
+        self.route_rules = route_rules
+        self.default_rule = default_rule
+        self.exempt_paths = exempt_paths
+
+    @classmethod
+    def from_env(cls):
+        """Build a limiter from RATE_LIMIT_BACKEND ("memory" or "redis") and REDIS_URL"""
+        if os.getenv("RATE_LIMIT_BACKEND", "memory") == "redis":
+            backend = RedisBucketBackend(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+        else:
+            backend = InMemoryBucketBackend()
+        return cls(backend)
+
+    def _match(self, path: str):
+        for prefix, group, rule in self.route_rules:
+            if path.startswith(prefix):
+                return group, rule
+        return "default", self.default_rule
+
+    def check(self, client_id: str, path: str):
+        """Return None if the request may proceed, else the Retry-After delay in seconds"""
+        if path in self.exempt_paths:
+            return None
+        group, rule = self._match(path)
+        try:
+            retry_after = self.backend.take(f"{client_id}:{group}", rule)
+        except Exception as e:
+            # Never take the API down because the limiter backend is unavailable
+            logging.error(f"Rate limiter backend error: {str(e)}")
+            return None
+        return retry_after if retry_after > 0 else None
@@ -0,0 +1,147 @@
+import logging
+import time
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from elasticsearch import helpers
+from infrastructure.supabase_inf import Supabase_Infrastructure
+from infrastructure.cofounders import parse_cofounder_ids
+from infrastructure.indexing_pipeline import iter_table, iter_batches
+from infrastructure.matching import blocked_top_k
+
+RECOMMENDATION_TABLE = "recommendation_table"
+# Keeps about_content + business plan under the embedding model's input limit
+MAX_TEXT_CHARS = 8000
+
+
+def startup_text(row) -> str:
+    text = "\n\n".join(part for part in (row.get('about_content'), row.get('business_plan_content')) if part)
+    return text[:MAX_TEXT_CHARS]
+
+
+class RecommendationJob:
+    """
+    Batch startup -> candidate matching over the resume embeddings.
+
+    Every startup's about_content and business plan are embedded in
+    batches, every user's `resume_embedding` is read once from the user
+    index, and all startups are scored against all users with blocked
+    matrix products plus `argpartition` (a startup's own cofounders are
+    never recommended). The top `top_n` per startup are upserted into
+    `recommendation_table` keyed by (startup_id, rank), so the workspace
+    reads candidates with one query instead of a live retrieval call.
+    Every row of a run carries the run's `updated_at`; once all are
+    written, older rows (ranks a startup no longer fills, startups that
+    were deleted) are removed.
+    """
+
+    def __init__(self, es, embeddings, supabase_inf: Supabase_Infrastructure = None,
+                 user_index: str = "user_index3", vector_field: str = "resume_embedding",
+                 top_n: int = 50, batch_size: int = 64, max_workers: int = 4, write_batch_size: int = 500):
+        self.es = es
+        self.embeddings = embeddings
+        self.supabase_inf = supabase_inf or Supabase_Infrastructure()
+        self.user_index = user_index
+        self.vector_field = vector_field
+        self.top_n = top_n
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.write_batch_size = write_batch_size
+
+    def load_users(self):
+        """Return (user ids, L2-normalized float32 matrix) of every indexed resume"""
+        ids, vectors = [], []
+        for hit in helpers.scan(self.es, index=self.user_index, query={"query": {"match_all": {}}},
+                                _source_includes=[self.vector_field], size=500):
+            vector = hit["_source"].get(self.vector_field)
+            if vector is not None:
+                ids.append(int(hit["_id"]))
+                vectors.append(vector)
+        matrix = np.array(vectors, dtype=np.float32)
+        if len(ids):
+            matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        return ids, matrix
+
+    def embed_startups(self, startups):
+        """Embed every startup text, `batch_size` per request on up to `max_workers` requests"""
+        texts = [startup_text(row) or row.get('name', '') for row in startups]
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            vectors = [vector for batch in executor.map(self.embeddings.embed_documents, batches) for vector in batch]
+        matrix = np.array(vectors, dtype=np.float32)
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        return matrix
+
+    def rank(self, startups, startup_matrix, user_ids, user_matrix):
+        """Yield (startup_id, [(user_id, score), ...]) for every startup, best candidates first"""
+        column = {user_id: i for i, user_id in enumerate(user_ids)}
+
+        def exclude_founders(block, start, stop):
+            for row, startup in enumerate(startups[start:stop]):
+                founders = [column[i] for i in parse_cofounder_ids(startup.get('cofounders')) if i in column]
+                block[row, founders] = -np.inf
+
+        top, top_scores = blocked_top_k(startup_matrix, user_matrix, min(self.top_n, len(user_ids)), exclude_founders)
+        for row, startup in enumerate(startups):
+            yield startup['startup_id'], [
+                (user_ids[i], float(score)) for i, score in zip(top[row], top_scores[row]) if np.isfinite(score)
+            ]
+
+    def write(self, ranked):
+        updated_at = datetime.now(timezone.utc).isoformat()
+        rows = (
+            {"startup_id": startup_id, "user_id": user_id, "rank": rank, "score": score, "updated_at": updated_at}
+            for startup_id, candidates in ranked
+            for rank, (user_id, score) in enumerate(candidates)
+        )
+        written = 0
+        for batch in iter_batches(rows, self.write_batch_size):
+            self.supabase_inf.client.table(RECOMMENDATION_TABLE) \
+                .upsert(batch, on_conflict="startup_id,rank") \
+                .execute()
+            written += len(batch)
+        # Only after every row of this run is in place, so a failed run leaves the previous one intact
+        self.supabase_inf.client.table(RECOMMENDATION_TABLE) \
+            .delete() \
+            .lt("updated_at", updated_at) \
+            .execute()
+        return written
+
+    def run(self):
+        started = time.perf_counter()
+        user_ids, user_matrix = self.load_users()
+        startups = list(iter_table(self.supabase_inf, "startup_table", "startup_id",
+                                   "startup_id, name, about_content, business_plan_content, cofounders"))
+        if not user_ids or not startups:
+            # Nothing to recommend: clear what earlier runs wrote
+            self.write(iter(()))
+            return {"startups": len(startups), "users": len(user_ids), "rows": 0, "seconds": 0.0}
+        loaded = time.perf_counter()
+
+        startup_matrix = self.embed_startups(startups)
+        embedded = time.perf_counter()
+
+        written = self.write(self.rank(startups, startup_matrix, user_ids, user_matrix))
+        finished = time.perf_counter()
+        stats = {
+            "startups": len(startups),
+            "users": len(user_ids),
+            "rows": written,
+            "load_seconds": round(loaded - started, 2),
+            "embed_seconds": round(embedded - loaded, 2),
+            "rank_and_write_seconds": round(finished - embedded, 2),
+            "seconds": round(finished - started, 2),
+        }
+        logging.info(f"Recommendations: {stats}")
+        return stats
+
+
+def get_recommendations(supabase_inf: Supabase_Infrastructure, startup_id, limit: int = 20, offset: int = 0):
+    """Read one startup's precomputed candidates, best first"""
+    response = supabase_inf.client.table(RECOMMENDATION_TABLE) \
+        .select("user_id, rank, score") \
+        .eq("startup_id", startup_id) \
+        .order("rank") \
+        .range(offset, offset + limit - 1) \
+        .execute()
+    return response.data or []
@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from infrastructure.embedding_cache import QueryEmbeddingCache
+
+
+class SemanticResponseCache:
+    """
+    Founder Q&A answers keyed by (startup_id, founder-context hash).
+
+    A question hits when it matches a cached one verbatim (after
+    normalization) or when the cosine similarity of their embeddings is at
+    least `threshold`. Entries expire after `ttl` seconds and the oldest
+    are evicted beyond `maxsize`. Hashing the founder context means a
+    startup whose founders changed never gets answers about the old team.
+    """
+
+    def __init__(self, embedder: QueryEmbeddingCache, threshold: float = 0.95,
+                 ttl: float = 3600, maxsize: int = 5000):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # entry id -> (key, question, vector, answer, expires_at)
+        self._by_key = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _match(self, key, question, vector=None):
+        """Return the best cached answer for `key`, or None"""
+        now = time.monotonic()
+        best_id, best_score = None, self.threshold
+        with self._lock:
+            for entry_id in list(self._by_key.get(key, ())):
+                _, cached_question, cached_vector, _, expires_at = self._entries[entry_id]
+                if expires_at <= now:
+                    self._remove(entry_id)
+                    continue
+                if cached_question == question:
+                    best_id = entry_id
+                    break
+                if vector is not None:
+                    score = float(cached_vector @ vector)
+                    if score >= best_score:
+                        best_id, best_score = entry_id, score
+            if best_id is None:
+                return None
+            self._entries.move_to_end(best_id)
+            return self._entries[best_id][3]
+
+    def _count(self, answer):
+        with self._lock:
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+    def lookup(self, startup_id, context_hash, question):
+        """Return (cached answer or None, question vector to pass to `store`)"""
+        key, normalized = (str(startup_id), context_hash), QueryEmbeddingCache.normalize(question)
+        answer = self._match(key, normalized)
+        vector = None
+        if answer is None:
+            vector = self._unit(self.embedder.embed(question))
+            answer = self._match(key, normalized, vector)
+        self._count(answer)
+        return answer, vector
+
+    async def alookup(self, startup_id, context_hash, question):
+        key, normalized = (str(startup_id), context_hash), QueryEmbeddingCache.normalize(question)
+        answer = self._match(key, normalized)
+        vector = None
+        if answer is None:
+            vector = self._unit(await self.embedder.aembed(question))
+            answer = self._match(key, normalized, vector)
+        self._count(answer)
+        return answer, vector
+
+    def store(self, startup_id, context_hash, question, vector, answer):
+        if vector is None or not answer:
+            return
+        key = (str(startup_id), context_hash)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (key, QueryEmbeddingCache.normalize(question), vector, answer,
+                                       time.monotonic() + self.ttl)
+            self._by_key.setdefault(key, set()).add(entry_id)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, entry_id):
+        key = self._entries.pop(entry_id)[0]
+        ids = self._by_key.get(key)
+        if ids is not None:
+            ids.discard(entry_id)
+            if not ids:
+                del self._by_key[key]
+
+    def invalidate(self, startup_id=None):
+        """Drop the answers of one startup, or all of them"""
+        with self._lock:
+            for entry_id, entry in list(self._entries.items()):
+                if startup_id is None or entry[0][0] == str(startup_id):
+                    self._remove(entry_id)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "threshold": self.threshold,
+                "ttl": self.ttl,
+            }
@@ -0,0 +1,228 @@
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import suppress
+
+# SSE comment line: keeps proxies and the client from timing out, ignored by EventSource/our parser
+HEARTBEAT = ": ping\n\n"
+
+_DONE = object()
+
+
+def sse_event(payload) -> str:
+    # json.dumps escapes newlines, so a multi-line answer is still one event
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def chunk_text(chunk) -> str:
+    return str(chunk.content) if hasattr(chunk, 'content') else str(chunk)
+
+
+async def areplay(text: str):
+    """Async iterator over an already known answer, e.g. a cache hit"""
+    yield text
+
+
+class StreamMetrics:
+    """Time-to-first-token and throughput of one streamed answer"""
+
+    # Last few hundred streams, for /ask/stream_metrics
+    recent = deque(maxlen=500)
+
+    def __init__(self, label: str):
+        self.label = label
+        self.started = time.perf_counter()
+        self.first_token_at = None
+        self.tokens = 0
+        self.events = 0
+        self.disconnected = False
+
+    def token(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.tokens += 1
+
+    def summary(self):
+        ended = time.perf_counter()
+        generating = ended - self.first_token_at if self.first_token_at else 0.0
+        return {
+            "label": self.label,
+            "ttft_ms": round((self.first_token_at - self.started) * 1000, 1) if self.first_token_at else None,
+            "tokens": self.tokens,
+            "events": self.events,
+            "tokens_per_second": round(self.tokens / generating, 1) if generating else 0.0,
+            "duration_ms": round((ended - self.started) * 1000, 1),
+            "disconnected": self.disconnected,
+        }
+
+    def record(self):
+        summary = self.summary()
+        StreamMetrics.recent.append(summary)
+        logging.info(f"Stream {summary['label']}: ttft={summary['ttft_ms']}ms, {summary['tokens']} tokens "
+                     f"in {summary['events']} events, {summary['tokens_per_second']} tok/s"
+                     f"{' (client disconnected)' if summary['disconnected'] else ''}")
+        return summary
+
+
+class TokenBatcher:
+    """
+    Groups streamed tokens into SSE events: the first token goes out at once,
+    after that an event is cut every `max_chars` characters or `max_delay`
+    seconds, whichever comes first.
+    """
+
+    def __init__(self, max_chars: int = 48, max_delay: float = 0.05):
+        self.max_chars = max_chars
+        self.max_delay = max_delay
+        self._parts = []
+        self._size = 0
+        self._last_emit = None
+
+    @property
+    def pending(self):
+        return bool(self._parts)
+
+    def add(self, text: str):
+        """Buffer a token; return an event if one is due"""
+        self._parts.append(text)
+        self._size += len(text)
+        if (self._last_emit is None or self._size >= self.max_chars
+                or time.monotonic() - self._last_emit >= self.max_delay):
+            return self.flush()
+        return None
+
+    def flush(self):
+        if not self._parts:
+            return None
+        text = "".join(self._parts)
+        self._parts, self._size = [], 0
+        self._last_emit = time.monotonic()
+        return sse_event({'text': text})
+
+
+def stream_sse(chunks, label: str, heartbeat: float = 15.0, max_chars: int = 48, max_delay: float = 0.05,
+               on_complete=None):
+    """
+    Turn a blocking LLM chunk iterator into SSE text for a WSGI response.
+
+    The iterator is drained by a worker thread so heartbeats can be sent
+    while the model is thinking. When the client disconnects the server
+    closes this generator; the worker then stops and closes the LLM stream.
+    `on_complete` is called with the full answer if the stream finished cleanly.
+    """
+    metrics = StreamMetrics(label)
+    answer = []
+    batcher = TokenBatcher(max_chars, max_delay)
+    tokens = queue.Queue()
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for chunk in chunks:
+                if stop.is_set():
+                    break
+                tokens.put(chunk_text(chunk))
+        except Exception as e:
+            tokens.put(e)
+        finally:
+            close = getattr(chunks, "close", None)
+            if close:
+                close()
+            tokens.put(_DONE)
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            try:
+                item = tokens.get(timeout=max_delay if batcher.pending else heartbeat)
+            except queue.Empty:
+                event = batcher.flush()
+                metrics.events += bool(event)
+                yield event or HEARTBEAT
+                continue
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                logging.error(f"Streaming error: {str(item)}")
+                yield sse_event({'error': str(item)})
+                return
+            metrics.token()
+            answer.append(item)
+            event = batcher.add(item)
+            if event:
+                metrics.events += 1
+                yield event
+        event = batcher.flush()
+        if event:
+            metrics.events += 1
+            yield event
+        if on_complete:
+            on_complete("".join(answer))
+    except GeneratorExit:
+        metrics.disconnected = True
+        raise
+    finally:
+        stop.set()
+        metrics.record()
+
+
+async def astream_sse(chunks, label: str, is_disconnected=None, heartbeat: float = 15.0,
+                      max_chars: int = 48, max_delay: float = 0.05, on_complete=None):
+    """Async twin of `stream_sse` for the ASGI app; `is_disconnected` is e.g. `request.is_disconnected`"""
+    metrics = StreamMetrics(label)
+    answer = []
+    batcher = TokenBatcher(max_chars, max_delay)
+    iterator = chunks.__aiter__()
+    pending = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            done, _ = await asyncio.wait({pending}, timeout=max_delay if batcher.pending else heartbeat)
+            if not done:
+                if is_disconnected and await is_disconnected():
+                    metrics.disconnected = True
+                    return
+                event = batcher.flush()
+                metrics.events += bool(event)
+                yield event or HEARTBEAT
+                continue
+            try:
+                text = chunk_text(pending.result())
+            except StopAsyncIteration:
+                break
+            finally:
+                pending = None
+            metrics.token()
+            answer.append(text)
+            event = batcher.add(text)
+            if event:
+                metrics.events += 1
+                yield event
+        event = batcher.flush()
+        if event:
+            metrics.events += 1
+            yield event
+        if on_complete:
+            on_complete("".join(answer))
+    except (GeneratorExit, asyncio.CancelledError):
+        metrics.disconnected = True
+        raise
+    except Exception as e:
+        logging.error(f"Streaming error: {str(e)}")
+        yield sse_event({'error': str(e)})
+    finally:
+        # Stop the LLM request as soon as nobody is listening
+        if pending is not None:
+            pending.cancel()
+            with suppress(BaseException):
+                await pending
+        aclose = getattr(iterator, "aclose", None)
+        if aclose:
+            with suppress(Exception):
+                await aclose()
+        metrics.record()
@@ -0,0 +1,241 @@
+import logging
+import threading
+import time
+from infrastructure.supabase_inf import Supabase_Infrastructure
+from infrastructure.cofounders import parse_cofounder_ids
+from infrastructure.swipe_deck import ID_PAGE_SIZE
+from infrastructure.ttl_cache import TTLCache
+
+# Startup columns a card carries (the detail view needs the business plan too)
+STARTUP_COLUMNS = "startup_id, name, industry, about_content, logo_path, business_plan_content, cofounders"
+# Founder summary columns shared by the swipe card, the detail view and the Q&A context
+FOUNDER_COLUMNS = "user_id, name, university, major, profile_pic_path, linked_in_url, about_me"
+
+# Keeps `in_()` filters well under PostgREST's URL length limit
+USER_BATCH_SIZE = 200
+
+
+def founder_summary(user):
+    return {
+        "user_id": user['user_id'],
+        "name": user.get('name', 'Unknown'),
+        "university": user.get('university', ''),
+        "major": user.get('major', ''),
+        "profile_pic": user.get('profile_pic_path', ''),
+        "linkedin": user.get('linked_in_url', ''),
+        "about_me": user.get('about_me', '')
+    }
+
+
+class StartupCardStore:
+    """
+    Materialized startup cards: the startup row plus its founder summaries.
+
+    The `cofounders` string of every startup is parsed once into a
+    startup -> founders adjacency (and its reverse), and each card is
+    assembled once, so the deck, detail and Q&A endpoints read a
+    precomputed object instead of joining on every request. The whole
+    store is rebuilt in the background once it is older than `max_age`;
+    `refresh_startups` / `refresh_users` rebuild only the cards touched by
+    a change. `on_change` is called with the ids of the cards that were
+    actually added, changed or removed, by a full rebuild as well, and not
+    at all when nothing changed. Ids
+    that do not exist are remembered for `max_age` seconds, so probing
+    unknown startups does not cost a Supabase round trip each time.
+    """
+
+    def __init__(self, supabase_inf: Supabase_Infrastructure = None, max_age: float = 600, on_change=None):
+        self.supabase_inf = supabase_inf or Supabase_Infrastructure()
+        self.max_age = max_age
+        self.on_change = on_change
+        self._cards = {}
+        self._founders = {}   # startup_id -> [user_id, ...]
+        self._startups_of = {}  # user_id -> {startup_id, ...}
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+        self._build_lock = threading.RLock()
+        self._rebuilding = False
+        self._unknown = TTLCache(maxsize=10000, ttl=max_age)
+
+    def _fetch_startups(self, startup_ids=None):
+        if startup_ids is not None:
+            response = self.supabase_inf.client.table("startup_table") \
+                .select(STARTUP_COLUMNS) \
+                .in_("startup_id", list(startup_ids)) \
+                .execute()
+            return response.data or []
+        rows, start = [], 0
+        while True:
+            page = self.supabase_inf.client.table("startup_table") \
+                .select(STARTUP_COLUMNS) \
+                .order("startup_id") \
+                .range(start, start + ID_PAGE_SIZE - 1) \
+                .execute()
+            rows.extend(page.data or [])
+            if len(page.data or []) < ID_PAGE_SIZE:
+                return rows
+            start += ID_PAGE_SIZE
+
+    def _fetch_users(self, user_ids):
+        user_ids = sorted(user_ids)
+        users = {}
+        for start in range(0, len(user_ids), USER_BATCH_SIZE):
+            batch = user_ids[start:start + USER_BATCH_SIZE]
+            for user in self.supabase_inf.get_users_by_ids(batch, FOUNDER_COLUMNS):
+                users[int(user['user_id'])] = user
+        return users
+
+    def _assemble(self, startups):
+        """Build cards and adjacency for a batch of startup rows, one user query per USER_BATCH_SIZE founders"""
+        founders = {int(row['startup_id']): parse_cofounder_ids(row.get('cofounders')) for row in startups}
+        users = self._fetch_users({user_id for ids in founders.values() for user_id in ids})
+        cards = {}
+        for row in startups:
+            startup_id = int(row['startup_id'])
+            ids = founders[startup_id]
+            cards[startup_id] = {
+                "startup_id": startup_id,
+                "name": row['name'],
+                "industry": row.get('industry', ''),
+                "about_content": row.get('about_content', ''),
+                "logo_path": row.get('logo_path', ''),
+                "business_plan_content": row.get('business_plan_content', ''),
+                "cofounder_ids": ids,
+                "cofounders": [founder_summary(users[user_id]) for user_id in ids if user_id in users]
+            }
+        return cards, founders
+
+    def _link(self, startup_id, user_ids):
+        for user_id in self._founders.get(startup_id, ()):
+            linked = self._startups_of.get(user_id)
+            if linked is not None:
+                linked.discard(startup_id)
+                if not linked:
+                    del self._startups_of[user_id]
+        if user_ids is None:
+            self._founders.pop(startup_id, None)
+            return
+        self._founders[startup_id] = user_ids
+        for user_id in user_ids:
+            self._startups_of.setdefault(user_id, set()).add(startup_id)
+
+    def rebuild(self):
+        """Rebuild every card from Supabase"""
+        with self._build_lock:
+            started = time.perf_counter()
+            cards, founders = self._assemble(self._fetch_startups())
+            startups_of = {}
+            for startup_id, user_ids in founders.items():
+                for user_id in user_ids:
+                    startups_of.setdefault(user_id, set()).add(startup_id)
+            with self._lock:
+                previous = self._cards
+                self._cards, self._founders, self._startups_of = cards, founders, startups_of
+                self._built_at = time.monotonic()
+            self._unknown.invalidate()
+            changed = {startup_id for startup_id in previous.keys() | cards.keys()
+                       if previous.get(startup_id) != cards.get(startup_id)}
+            logging.info(f"Built {len(cards)} startup cards ({len(changed)} changed) "
+                         f"in {time.perf_counter() - started:.2f}s")
+        if changed and self.on_change:
+            self.on_change(changed)
+
+    def _rebuild_in_background(self):
+        def run():
+            try:
+                self.rebuild()
+            except Exception as e:
+                logging.error(f"Error rebuilding startup cards: {str(e)}")
+            finally:
+                self._rebuilding = False
+
+        self._rebuilding = True
+        threading.Thread(target=run, daemon=True).start()
+
+    def _ensure_built(self):
+        if not self._built_at:
+            with self._build_lock:
+                if not self._built_at:
+                    self.rebuild()
+        elif time.monotonic() - self._built_at > self.max_age and not self._rebuilding:
+            self._rebuild_in_background()
+
+    def refresh_startups(self, startup_ids):
+        """Rebuild the cards of changed (or deleted) startups"""
+        startup_ids = {int(startup_id) for startup_id in startup_ids}
+        if not startup_ids:
+            return
+        cards, founders = self._assemble(self._fetch_startups(startup_ids))
+        changed = set()
+        with self._lock:
+            for startup_id in startup_ids:
+                if startup_id in cards:
+                    self._unknown.invalidate(startup_id)
+                    if self._cards.get(startup_id) != cards[startup_id]:
+                        changed.add(startup_id)
+                        self._cards[startup_id] = cards[startup_id]
+                        self._link(startup_id, founders[startup_id])
+                else:
+                    self._unknown.set(startup_id, True)
+                    if self._cards.pop(startup_id, None) is not None:
+                        changed.add(startup_id)
+                        self._link(startup_id, None)
+        if changed and self.on_change:
+            self.on_change(changed)
+
+    def refresh_users(self, user_ids):
+        """Rebuild the cards of every startup a changed user founded"""
+        with self._lock:
+            startup_ids = set().union(*(self._startups_of.get(int(user_id), set()) for user_id in user_ids))
+        self.refresh_startups(startup_ids)
+
+    def get(self, startup_id):
+        """Return the card of one startup, loading it on a miss; None if it does not exist"""
+        if not str(startup_id).isdigit():
+            return None
+        self._ensure_built()
+        startup_id = int(startup_id)
+        card = self._cards.get(startup_id)
+        if card is None and self._unknown.get(startup_id) is None:
+            # Created after the last rebuild
+            self.refresh_startups([startup_id])
+            card = self._cards.get(startup_id)
+        return card
+
+    def peek(self, startup_id):
+        """Return a card only if it is already materialized (never touches Supabase)"""
+        return self._cards.get(int(startup_id)) if str(startup_id).isdigit() else None
+
+    def ids(self):
+        self._ensure_built()
+        with self._lock:
+            return list(self._cards)
+
+    def swipe_cards(self, startup_ids):
+        """Card projection used by the swipe deck (no business plan, compact founders)"""
+        cards = []
+        for startup_id in startup_ids:
+            card = self._cards.get(int(startup_id))
+            if card is None:
+                continue
+            cards.append({
+                "startup_id": card["startup_id"],
+                "name": card["name"],
+                "industry": card["industry"],
+                "about_content": card["about_content"],
+                "logo_path": card["logo_path"],
+                "cofounders": [
+                    {key: founder[key] for key in ("name", "university", "major", "profile_pic")}
+                    for founder in card["cofounders"]
+                ]
+            })
+        return cards
+
+    def stats(self):
+        with self._lock:
+            return {
+                "cards": len(self._cards),
+                "founder_links": sum(len(ids) for ids in self._founders.values()),
+                "age_seconds": round(time.monotonic() - self._built_at, 1) if self._built_at else None,
+                "max_age": self.max_age,
+            }
@@ -1,4 +1,4 @@
-from supabase import create_client, Client
+from supabase import create_client, acreate_client, Client
 from dotenv import load_dotenv
 import os
 
@@ -16,12 +16,34 @@ class Supabase_Infrastructure:
         user = response.data[0] if response.data else None
         return user
 
+    def get_users_by_ids(self, user_ids, columns="*"):
+        """Fetch many users in a single round trip with an `in` filter"""
+        if not user_ids:
+            return []
+        response = self.client.table("user_table").select(columns).in_("user_id", list(user_ids)).execute()
+        return response.data or []
+
     def get_startup_by_id(self, user_id):
         response = self.client.table("startup_table").select("*").eq("startup_id", user_id).execute()
         startup = response.data[0] if response.data else None
         return startup
 
 
+class Async_Supabase_Infrastructure:
+    """Async counterpart used by the ASGI app; build it with `await Async_Supabase_Infrastructure.create()`"""
+    def __init__(self, client):
+        self.client = client
 
+    @classmethod
+    async def create(cls):
+        return cls(await acreate_client(url, api_key))
 
+    async def get_startup_by_id(self, startup_id):
+        response = await self.client.table("startup_table").select("*").eq("startup_id", startup_id).execute()
+        return response.data[0] if response.data else None
 
+    async def get_users_by_ids(self, user_ids, columns="*"):
+        if not user_ids:
+            return []
+        response = await self.client.table("user_table").select(columns).in_("user_id", list(user_ids)).execute()
+        return response.data or []
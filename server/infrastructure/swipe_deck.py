@@ -0,0 +1,147 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from infrastructure.supabase_inf import Supabase_Infrastructure
+from infrastructure.indexing_pipeline import iter_table
+
+# Only the fields the Matching/Welcome cards render
+USER_CARD_COLUMNS = "user_id, name, university, major, education_level, about_me, is_cofounder, profile_pic_path"
+
+# Supabase caps a select at 1000 rows, so the id index is read in pages
+ID_PAGE_SIZE = 1000
+
+
+class SwipeDeck:
+    """
+    In-memory, pre-shuffled deck of swipe cards for one table.
+
+    The ids of the table are cached for `id_ttl` seconds; the deck is
+    refilled by sampling `deck_size` of those ids and fetching their card
+    columns in one `in_()` query, so a `draw` normally never touches the
+    database. When the deck drops below `low_watermark` a background
+    refill is started. `source`, if given, is an in-memory card store with `ids()` and
+    `swipe_cards(ids)` that replaces the Supabase reads entirely.
+
+    `invalidate` never takes the deck lock, it only records what to drop
+    on the next `draw`, so a source may call it from inside a refill.
+    """
+
+    def __init__(self, supabase_inf: Supabase_Infrastructure = None, table: str = "user_table",
+                 id_column: str = "user_id", columns: str = USER_CARD_COLUMNS,
+                 deck_size: int = 200, low_watermark: int = 50, id_ttl: int = 600,
+                 source=None):
+        self.supabase_inf = supabase_inf or Supabase_Infrastructure()
+        self.table = table
+        self.id_column = id_column
+        self.columns = columns
+        self.deck_size = deck_size
+        self.low_watermark = low_watermark
+        self.id_ttl = id_ttl
+        self.source = source
+        self._ids = []
+        self._ids_loaded_at = 0.0
+        self._deck = deque()
+        self._lock = threading.Lock()
+        self._refilling = False
+        # Invalidations recorded by `invalidate`, applied by `draw` under `_lock`
+        self._pending_lock = threading.Lock()
+        self._stale = False
+        self._discard = set()
+        self._generation = 0
+
+    def _load_ids(self):
+        """Return the cached id index, re-reading it from Supabase when stale"""
+        if self.source is not None:
+            return self.source.ids()
+        if self._ids and time.monotonic() - self._ids_loaded_at < self.id_ttl:
+            return self._ids
+        # Ordered pages, so no id is skipped or repeated between them
+        ids = [row[self.id_column] for row in iter_table(self.supabase_inf, self.table, self.id_column,
+                                                         self.id_column, ID_PAGE_SIZE)]
+        self._ids = ids
+        self._ids_loaded_at = time.monotonic()
+        logging.info(f"Loaded {len(ids)} ids from {self.table}")
+        return self._ids
+
+    def _fetch_cards(self, ids):
+        """Fetch the card columns for `ids` in one round trip"""
+        if self.source is not None:
+            return self.source.swipe_cards(ids)
+        response = self.supabase_inf.client.table(self.table) \
+            .select(self.columns) \
+            .in_(self.id_column, ids) \
+            .execute()
+        return response.data or []
+
+    def _refill(self):
+        ids = self._load_ids()
+        if not ids:
+            return []
+        sample = random.sample(ids, min(self.deck_size, len(ids)))
+        cards = self._fetch_cards(sample)
+        random.shuffle(cards)
+        return cards
+
+    def _extend(self, cards):
+        """Append the cards that are not in the deck yet; caller holds `_lock`"""
+        dealt = {card[self.id_column] for card in self._deck}
+        for card in cards:
+            if card[self.id_column] not in dealt:
+                dealt.add(card[self.id_column])
+                self._deck.append(card)
+
+    def _refill_in_background(self):
+        generation = self._generation
+
+        def run():
+            try:
+                cards = self._refill()
+                with self._lock:
+                    # Cards sampled before an invalidation are dropped
+                    if generation == self._generation and not self._stale:
+                        self._extend(cards)
+            except Exception as e:
+                logging.error(f"Error refilling {self.table} deck: {str(e)}")
+            finally:
+                with self._lock:
+                    self._refilling = False
+
+        self._refilling = True
+        threading.Thread(target=run, daemon=True).start()
+
+    def _apply_invalidation(self):
+        """Drop what `invalidate` asked for; caller holds `_lock`"""
+        with self._pending_lock:
+            stale, self._stale = self._stale, False
+            discard, self._discard = self._discard, set()
+        if stale:
+            self._ids = []
+            self._ids_loaded_at = 0.0
+            self._deck.clear()
+            self._generation += 1
+        elif discard:
+            self._deck = deque(card for card in self._deck if card[self.id_column] not in discard)
+
+    def draw(self, count: int):
+        """Pop `count` cards from the deck, refilling synchronously if it runs dry"""
+        if self.source is not None:
+            # Build a cold source before taking the lock, its callbacks may invalidate this deck
+            self.source.ids()
+        with self._lock:
+            self._apply_invalidation()
+            if len(self._deck) < count:
+                self._extend(self._refill())
+            cards = [self._deck.popleft() for _ in range(min(count, len(self._deck)))]
+            if len(self._deck) < self.low_watermark and not self._refilling:
+                self._refill_in_background()
+        return cards
+
+    def invalidate(self, ids=None):
+        """On the next `draw`, drop the cards of `ids`, or the id index and every card"""
+        with self._pending_lock:
+            if ids is None:
+                self._stale = True
+            else:
+                self._discard.update(ids)
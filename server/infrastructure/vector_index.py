@@ -0,0 +1,201 @@
+import argparse
+import json
+import os
+import re
+import time
+import numpy as np
+
+try:
+    from infrastructure.ranking import rrf_fuse
+except ImportError:  # run as a script from inside infrastructure/
+    from ranking import rrf_fuse
+
+# Rows scored per matrix-vector product, bounds the temporary float32 buffer
+BLOCK_ROWS = 65536
+
+TEXT_FIELDS = {"name": 3.0, "about_me": 1.0, "about_content": 1.0,
+               "major": 1.0, "industry": 1.0, "university": 1.0}
+
+_TOKEN = re.compile(r"\w+")
+
+
+def _tokens(text):
+    return set(_TOKEN.findall(str(text or "").lower()))
+
+
+class NumpyVectorIndex:
+    """
+    Exact cosine top-k over a contiguous, memory-mapped matrix.
+
+    Vectors are L2-normalized at build time, so a query is one
+    matrix-vector product plus `argpartition`. With `quantize=True` rows
+    are stored as int8 with one float32 scale per row (4x smaller).
+
+    On disk an index at `path` is `path.vectors.npy`, optionally
+    `path.scales.npy`, and `path.meta.json` with the ids and the
+    (vector-free) documents. Queries must have the index's `dims`; vectors
+    of another model or profile raise a ValueError instead of a bare
+    matmul error.
+    """
+
+    def __init__(self, vectors, ids, sources, scales=None):
+        self.vectors = vectors
+        self.ids = ids
+        self.sources = sources
+        self.scales = scales
+        self._text_index = None
+
+    @classmethod
+    def build(cls, path, ids, vectors, sources=None, quantize=False):
+        # An empty export still produces a loadable (empty) index
+        matrix = np.array(vectors, dtype=np.float32) if len(ids) else np.empty((0, 0), dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.maximum(norms, 1e-12)
+
+        scales = None
+        if quantize:
+            scales = np.abs(matrix).max(axis=1, initial=0.0) / 127.0
+            scales = np.maximum(scales, 1e-12).astype(np.float32)
+            matrix = np.round(matrix / scales[:, None]).astype(np.int8)
+            np.save(f"{path}.scales.npy", scales)
+        np.save(f"{path}.vectors.npy", matrix)
+
+        with open(f"{path}.meta.json", "w", encoding="utf-8") as file:
+            json.dump({
+                "ids": [str(doc_id) for doc_id in ids],
+                "sources": sources or [{} for _ in ids],
+                "dtype": str(matrix.dtype),
+            }, file)
+        return cls.load(path)
+
+    @classmethod
+    def load(cls, path, dims: int = None):
+        """Open an index; with `dims`, refuse one exported from vectors of another size"""
+        vectors = np.load(f"{path}.vectors.npy", mmap_mode="r")
+        scales = np.load(f"{path}.scales.npy") if os.path.exists(f"{path}.scales.npy") else None
+        with open(f"{path}.meta.json", encoding="utf-8") as file:
+            meta = json.load(file)
+        index = cls(vectors, meta["ids"], meta["sources"], scales)
+        if dims is not None and len(index) and index.dims != dims:
+            raise ValueError(f"Local index {path} holds {index.dims}-dim vectors, expected {dims}; "
+                             f"re-export it with the active VECTOR_PROFILE")
+        return index
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dims(self):
+        return self.vectors.shape[1]
+
+    def scores(self, query_vector):
+        """Cosine similarity of `query_vector` against every row"""
+        query = np.asarray(query_vector, dtype=np.float32)
+        if query.shape != (self.dims,):
+            raise ValueError(f"Query has {query.size} dims, the local index has {self.dims}")
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        out = np.empty(len(self.ids), dtype=np.float32)
+        for start in range(0, len(self.ids), BLOCK_ROWS):
+            block = self.vectors[start:start + BLOCK_ROWS]
+            out[start:start + len(block)] = block.astype(np.float32, copy=False) @ query
+        if self.scales is not None:
+            out *= self.scales
+        return out
+
+    def search(self, query_vector, k: int = 10):
+        """Return the top-k hits as ES-shaped dicts (_id, _score, _source)"""
+        if not len(self.ids):
+            return []
+        scores = self.scores(query_vector)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [{"_id": self.ids[i], "_score": float(scores[i]), "_source": self.sources[i]} for i in top]
+
+    def text_search(self, query: str, k: int = 10):
+        """Weighted term-overlap ranking, a stand-in for BM25 when there is no cluster"""
+        if self._text_index is None:
+            self._text_index = [
+                {field: _tokens(source.get(field)) for field in TEXT_FIELDS if source.get(field)}
+                for source in self.sources
+            ]
+        terms = _tokens(query)
+        scored = []
+        for i, fields in enumerate(self._text_index):
+            score = sum(weight * len(terms & fields[field])
+                        for field, weight in TEXT_FIELDS.items() if field in fields)
+            if score:
+                scored.append((score, i))
+        scored.sort(reverse=True)
+        return [{"_id": self.ids[i], "_score": score, "_source": self.sources[i]} for score, i in scored[:k]]
+
+
+class LocalSearchBackend:
+    """Serves ElasticSearchManager.search from two NumpyVectorIndex files, no cluster needed"""
+
+    def __init__(self, directory: str, rank_constant: int = 60, window: int = 20, dims: int = None):
+        self.users = NumpyVectorIndex.load(os.path.join(directory, "users"), dims)
+        self.startups = NumpyVectorIndex.load(os.path.join(directory, "startups"), dims)
+        self.rank_constant = rank_constant
+        self.window = window
+
+    def _search_index(self, index, query, query_embedding, search_type, limit):
+        if search_type == "text":
+            return index.text_search(query, limit)
+        if search_type == "vector":
+            return index.search(query_embedding, limit)
+        window = max(2 * limit, self.window)
+        return rrf_fuse([index.text_search(query, window), index.search(query_embedding, window)],
+                        limit, self.rank_constant)
+
+    def search(self, query, query_embedding, search_type, limit, fields=None):
+        def project(hits):
+            if not fields:
+                return [hit["_source"] for hit in hits]
+            return [{field: hit["_source"][field] for field in fields if field in hit["_source"]} for hit in hits]
+
+        return {
+            "users":    project(self._search_index(self.users, query, query_embedding, search_type, limit)),
+            "startups": project(self._search_index(self.startups, query, query_embedding, search_type, limit)),
+            "partial":  False,
+        }
+
+
+def build_from_elasticsearch(es, index, vector_field, path, quantize=False):
+    """Export every document of an ES index into a NumpyVectorIndex at `path`"""
+    from elasticsearch import helpers
+
+    ids, vectors, sources = [], [], []
+    for hit in helpers.scan(es, index=index, query={"query": {"match_all": {}}}, size=500):
+        source = hit["_source"]
+        vector = source.pop(vector_field, None)
+        if vector is None:
+            continue
+        ids.append(hit["_id"])
+        vectors.append(vector)
+        sources.append({key: value for key, value in source.items()
+                        if not key.endswith(("_vector", "_embedding")) and key not in ("content_hash", "row_hash")})
+    return NumpyVectorIndex.build(path, ids, np.asarray(vectors, dtype=np.float32), sources, quantize)
+
+
+if __name__ == "__main__":
+    from elasticsearch_inf import client
+    from vector_profile import profile_from_env
+
+    # The same VECTOR_PROFILE as the server: its indices, so its model and dims
+    profile = profile_from_env()
+    parser = argparse.ArgumentParser(description="Export the ES user/startup/resume vectors to local NumPy indices")
+    parser.add_argument("--out", default=os.path.join("..", "data", "vector_index"))
+    parser.add_argument("--int8", action="store_true", help="store int8-quantized rows")
+    args = parser.parse_args()
+    os.makedirs(args.out, exist_ok=True)
+
+    # "resumes" serves the resume retrievers of LangChain_Inf (text-embedding-3-small, not the about_me model)
+    for name, index, vector_field in (("users", "user_index3" + profile.index_suffix, "about_me_vector"),
+                                      ("startups", "startup_index" + profile.index_suffix, "about_content_vector"),
+                                      ("resumes", "user_index3", "resume_embedding")):
+        local = build_from_elasticsearch(client, index, vector_field, os.path.join(args.out, name), args.int8)
+        started = time.perf_counter()
+        if len(local):
+            local.search(np.asarray(local.vectors[0], dtype=np.float32), 10)
+        print(f"{name}: {len(local)} vectors, top-10 in {(time.perf_counter() - started) * 1000:.1f} ms")
@@ -0,0 +1,170 @@
+import argparse
+import csv
+import os
+import time
+from dataclasses import dataclass
+import numpy as np
+
+# text-embedding-3 models return unit vectors; shortening one keeps its leading
+# dimensions, so a 256/512-dim vector is the truncated, renormalized 1536-dim one
+NATIVE_DIMS = 1536
+
+
+@dataclass(frozen=True)
+class VectorProfile:
+    """
+    How vectors are embedded and stored in ES, applied to the mappings, the
+    indexing pipeline and query embedding alike.
+
+    `element_type="byte"` stores each dimension as one signed byte
+    (unit vector * 127), `index_type="int8_hnsw"` keeps float vectors but
+    lets ES quantize the HNSW graph to int8.
+
+    The profile covers the vectors this server indexes (`about_me_vector`,
+    `about_content_vector`). `resume_embedding` in the base user_index3 is
+    written by the resume ingestion outside this repo, so the resume
+    retriever and the recommendation job always use RESUME_PROFILE.
+    """
+    name: str
+    model: str = None
+    dims: int = NATIVE_DIMS
+    element_type: str = "float"
+    index_type: str = "hnsw"
+
+    def mapping(self):
+        """dense_vector mapping of a vector field"""
+        field = {"type": "dense_vector", "dims": self.dims, "index": True, "similarity": "cosine"}
+        if self.element_type != "float":
+            field["element_type"] = self.element_type
+        if self.index_type != "hnsw":
+            field["index_options"] = {"type": self.index_type}
+        return field
+
+    def embeddings(self):
+        """The LangChain embeddings client producing this profile's vectors"""
+        from langchain_openai import OpenAIEmbeddings
+
+        if self.model is None:
+            return OpenAIEmbeddings()
+        if self.dims < NATIVE_DIMS:
+            return OpenAIEmbeddings(model=self.model, dimensions=self.dims)
+        return OpenAIEmbeddings(model=self.model)
+
+    def encode(self, vector):
+        """Turn an embedding into the value ES stores / is queried with"""
+        if self.element_type != "byte":
+            return vector
+        vector = np.asarray(vector, dtype=np.float32)
+        vector = vector / max(float(np.linalg.norm(vector)), 1e-12)
+        return np.clip(np.round(vector * 127), -128, 127).astype(np.int8).tolist()
+
+    def bytes_per_vector(self):
+        """Approximate per-vector memory of the kNN index (raw vectors + graph quantization)"""
+        if self.element_type == "byte" or self.index_type == "int8_hnsw":
+            return self.dims
+        return 4 * self.dims
+
+    @property
+    def key(self):
+        """Identifies the vectors this profile produces, e.g. to tag cached query embeddings"""
+        return f"{self.name}:{self.model or 'text-embedding-ada-002'}:{self.dims}"
+
+    @property
+    def index_suffix(self):
+        """Indices of a non-default profile get their own names, mappings cannot change in place"""
+        return "" if self.name == "float" else f"_{self.name}"
+
+
+PROFILES = {
+    # What the indices have always used: ada-002, 1536 float dims
+    "float": VectorProfile("float"),
+    "int8": VectorProfile("int8", index_type="int8_hnsw"),
+    "small512": VectorProfile("small512", model="text-embedding-3-small", dims=512, index_type="int8_hnsw"),
+    "small256": VectorProfile("small256", model="text-embedding-3-small", dims=256, element_type="byte"),
+}
+
+# resume_embedding is produced outside this server and is not affected by VECTOR_PROFILE
+RESUME_PROFILE = VectorProfile("resume", model="text-embedding-3-small")
+
+
+def profile_from_env():
+    """VECTOR_PROFILE picks a preset; VECTOR_DIMS overrides its dimensions"""
+    profile = PROFILES[os.getenv("VECTOR_PROFILE", "float")]
+    dims = os.getenv("VECTOR_DIMS")
+    if dims:
+        profile = VectorProfile(f"{profile.name}_{dims}", profile.model or "text-embedding-3-small",
+                                int(dims), profile.element_type, profile.index_type)
+    return profile
+
+
+def _shorten(matrix, dims):
+    matrix = matrix[:, :dims]
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+
+def _simulate(profile, corpus, queries):
+    """The vectors ES would effectively score for a profile (exact search, no HNSW error)"""
+    corpus, queries = _shorten(corpus, profile.dims), _shorten(queries, profile.dims)
+    if profile.element_type == "byte":
+        return tuple(np.clip(np.round(m * 127), -128, 127).astype(np.float32) for m in (corpus, queries))
+    if profile.index_type == "int8_hnsw":
+        # ES int8 scalar quantization: the segment's value range mapped to 256 buckets
+        low, high = np.quantile(corpus, [0.005, 0.995])
+        step = (high - low) / 255
+        return tuple((np.round((np.clip(m, low, high) - low) / step) * step + low).astype(np.float32)
+                     for m in (corpus, queries))
+    return corpus, queries
+
+
+def recall_report(corpus, queries, profiles, k=10):
+    """Recall@k of each profile against exact float32 search on the full 1536-dim vectors"""
+    truth = np.argsort(-(_shorten(queries, NATIVE_DIMS) @ _shorten(corpus, NATIVE_DIMS).T), axis=1)[:, :k]
+    report = []
+    for profile in profiles:
+        profile_corpus, profile_queries = _simulate(profile, corpus, queries)
+        scores = profile_queries @ profile_corpus.T
+        found = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(truth, found)])
+        report.append({
+            "profile": profile.name,
+            "dims": profile.dims,
+            "storage": profile.element_type if profile.index_type == "hnsw" else profile.index_type,
+            f"recall@{k}": round(float(recall), 3),
+            "bytes_per_vector": profile.bytes_per_vector(),
+            "reduction": round(PROFILES["float"].bytes_per_vector() / profile.bytes_per_vector(), 1),
+        })
+    return report
+
+
+if __name__ == "__main__":
+    from embedding_store import EmbeddingStore
+    from langchain_openai import OpenAIEmbeddings
+
+    parser = argparse.ArgumentParser(description="Compare the recall of each vector profile on data/")
+    data_dir = os.path.join("..", "data")
+    parser.add_argument("--users", default=os.path.join(data_dir, "user_df.csv"))
+    parser.add_argument("--startups", default=os.path.join(data_dir, "startups.csv"))
+    parser.add_argument("--queries", type=int, default=200, help="startups used as queries")
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+    csv.field_size_limit(10 ** 9)
+
+    with open(args.users, encoding="utf-8") as file:
+        corpus_texts = [row["about_me"] or " " for row in csv.DictReader(file)]
+    with open(args.startups, encoding="utf-8") as file:
+        query_texts = [row["about_us"] or " " for row in csv.DictReader(file)][:args.queries]
+
+    # Embedded once at full size (and kept in the embedding store); shorter profiles truncate
+    store = EmbeddingStore(os.path.join(data_dir, "embeddings"), OpenAIEmbeddings(model="text-embedding-3-small"))
+    started = time.perf_counter()
+    corpus = np.array(store.embed_documents(corpus_texts), dtype=np.float32)
+    queries = np.array(store.embed_documents(query_texts), dtype=np.float32)
+    print(f"{len(corpus)} user profiles, {len(queries)} startup queries embedded in "
+          f"{time.perf_counter() - started:.1f}s ({store.stats()['misses']} API embeddings)")
+
+    profiles = [VectorProfile("small1536", "text-embedding-3-small")] + \
+        [profile for profile in PROFILES.values() if profile.model] + \
+        [VectorProfile("small1536_int8", "text-embedding-3-small", index_type="int8_hnsw"),
+         VectorProfile("small512_byte", "text-embedding-3-small", 512, element_type="byte")]
+    for row in recall_report(corpus, queries, profiles, args.k):
+        print("  ".join(f"{key}={value}" for key, value in row.items()))
@@ -1,9 +1,14 @@
-import os
+import argparse
 import csv
+import itertools
+import json
+import os
+import time
 from supabase import create_client, Client
 from dotenv import load_dotenv
 import uuid
 import requests
+from infrastructure.cofounders import parse_cofounder_ids
 
 # Load environment variables
 load_dotenv()
@@ -54,52 +59,146 @@ def create_tables(supabase: Client):
             cofounders TEXT[],
             created_at TIMESTAMPTZ DEFAULT NOW()
         )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS recommendation_table (
+            startup_id BIGINT NOT NULL,
+            user_id BIGINT NOT NULL,
+            rank INT NOT NULL,
+            score REAL,
+            updated_at TIMESTAMPTZ DEFAULT NOW(),
+            PRIMARY KEY (startup_id, rank)
+        )
         """
     ]
     
     for sql in tables_sql:
         execute_sql(supabase, sql)
 
-def import_from_csv(supabase: Client, startups_path: str, founders_path: str):
-    """Import data from CSV files"""
-    # First import founders to get IDs
-    founder_ids = {}
-    with open(founders_path, mode='r', encoding='utf-8') as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            founder_id = str(uuid.uuid4())
-            founder_ids[row['names']] = founder_id
-            
-            supabase.table('founders').insert({
-                'id': founder_id,
-                'name': row['names'],
-                'potential': row.get('potential', ''),
-                'current_positions': row.get('current_positions', ''),
-                'education_levels': row.get('education_levels', ''),
-                'majors': row.get('majors', ''),
-                'universities': row.get('universities', ''),
-                'about_me': row.get('about_me', ''),
-                'resume': row.get('resume', ''),
-                'user_id': row.get('user_id', '')
-            }).execute()
-
-    # Then import startups with cofounder references
-    with open(startups_path, mode='r', encoding='utf-8') as file:
+# Fixed namespace so a founder/startup always gets the same UUID: reruns upsert instead of duplicating
+ID_NAMESPACE = uuid.UUID('6f1c8f3e-2a4b-4c55-9d0e-5b7a1e3c9f10')
+
+csv.field_size_limit(10 ** 9)
+
+
+def founder_uuid(user_id) -> str:
+    return str(uuid.uuid5(ID_NAMESPACE, f"founder:{user_id}"))
+
+
+def startup_uuid(startup_id) -> str:
+    return str(uuid.uuid5(ID_NAMESPACE, f"startup:{startup_id}"))
+
+
+def founder_record(row):
+    return {
+        'id': founder_uuid(row['user_id']),
+        'name': row['names'],
+        'potential': row.get('potential', ''),
+        'current_positions': row.get('current_positions', ''),
+        'education_levels': row.get('education_levels', ''),
+        'majors': row.get('majors', ''),
+        'universities': row.get('universities', ''),
+        'about_me': row.get('about_me', ''),
+        'resume': row.get('resume', ''),
+        'user_id': row.get('user_id', '')
+    }
+
+
+def startup_record(row):
+    # cofounders is a tuple of user ids like "(2, 1482)"; they map straight to founder UUIDs
+    cofounder_ids = [founder_uuid(user_id) for user_id in parse_cofounder_ids(row.get('cofounders'))]
+    return {
+        'id': startup_uuid(row.get('id') or row['name']),
+        'name': row['name'],
+        'industry': row.get('industry', ''),
+        'about_us': row.get('about_us', ''),
+        'business_plan': row.get('business_plan', ''),
+        'cofounders': cofounder_ids
+    }
+
+
+def load_checkpoint(path: str) -> dict:
+    if path and os.path.exists(path):
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+    return {}
+
+
+def save_checkpoint(path: str, checkpoint: dict):
+    if not path:
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(checkpoint, file)
+    os.replace(tmp_path, path)
+
+
+def upsert_batch(supabase: Client, table: str, batch, retries: int = 3):
+    """Upsert one batch on the primary key, retrying transient failures with backoff"""
+    for attempt in range(retries):
+        try:
+            supabase.table(table).upsert(batch, on_conflict='id').execute()
+            return
+        except Exception as e:
+            if attempt == retries - 1:
+                raise
+            print(f"  batch upsert into {table} failed ({e}), retrying...")
+            time.sleep(2 ** attempt)
+
+
+def import_table(supabase: Client, table: str, csv_path: str, to_record, batch_size: int,
+                 checkpoint: dict, checkpoint_path: str):
+    """Stream a CSV into `table` in batches, skipping the rows a previous run already committed"""
+    done = checkpoint.get(table, 0)
+    imported = 0
+    started = time.perf_counter()
+    with open(csv_path, mode='r', encoding='utf-8') as file:
         reader = csv.DictReader(file)
-        for row in reader:
-            # Convert comma-separated founder names to IDs
-            cofounder_names = [name.strip() for name in row['cofounders'].split(',')]
-            cofounder_ids = [founder_ids[name] for name in cofounder_names if name in founder_ids]
-            
-            supabase.table('startups').insert({
-                'name': row['name'],
-                'industry': row.get('industry', ''),
-                'about_us': row.get('about_us', ''),
-                'business_plan': row.get('business_plan', ''),
-                'cofounders': cofounder_ids
-            }).execute()
+        for _ in itertools.islice(reader, done):
+            pass
+        if done:
+            print(f"  {table}: resuming after {done} rows")
+
+        while True:
+            batch = [to_record(row) for row in itertools.islice(reader, batch_size)]
+            if not batch:
+                break
+            upsert_batch(supabase, table, batch)
+            imported += len(batch)
+            checkpoint[table] = done + imported
+            save_checkpoint(checkpoint_path, checkpoint)
+            elapsed = time.perf_counter() - started
+            print(f"  {table}: {done + imported} rows ({imported / elapsed:.0f} rows/sec)")
+
+    elapsed = time.perf_counter() - started
+    print(f"  {table}: imported {imported} rows in {elapsed:.1f}s "
+          f"({imported / elapsed if elapsed else 0:.0f} rows/sec)")
+    return imported
+
+
+def import_from_csv(supabase: Client, startups_path: str, founders_path: str, batch_size: int = 500,
+                    checkpoint_path: str = None):
+    """
+    Import data from CSV files with batched upserts.
+
+    Progress is saved to `checkpoint_path` after every batch, so a rerun
+    continues where a failed one stopped. IDs are derived from the CSV
+    keys, which makes replaying a batch harmless.
+    """
+    checkpoint = load_checkpoint(checkpoint_path)
+    import_table(supabase, 'founders', founders_path, founder_record, batch_size, checkpoint, checkpoint_path)
+    import_table(supabase, 'startups', startups_path, startup_record, batch_size, checkpoint, checkpoint_path)
 
 def main():
+    data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+    parser = argparse.ArgumentParser(description="Create the tables and seed them from the CSV files")
+    parser.add_argument('--founders', default=os.path.join(data_dir, 'user_df.csv'))
+    parser.add_argument('--startups', default=os.path.join(data_dir, 'startups.csv'))
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--checkpoint', default='.import_checkpoint.json')
+    parser.add_argument('--restart', action='store_true', help="ignore the checkpoint and import everything again")
+    args = parser.parse_args()
+
     supabase = initialize_supabase()
     
     # First create the execute_sql function in Supabase
@@ -120,15 +219,16 @@ def main():
     """
     execute_sql(supabase, setup_sql)
     
-    # Paths to your CSV files
-    startups_csv = 'startups.csv'
-    founders_csv = 'founders.csv'
-    
     print("Creating tables...")
     create_tables(supabase)
     
-    print(f"Importing data from {founders_csv} and {startups_csv}...")
-    import_from_csv(supabase, startups_csv, founders_csv)
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    print(f"Importing data from {args.founders} and {args.startups}...")
+    import_from_csv(supabase, args.startups, args.founders, args.batch_size, args.checkpoint)
+    if os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
     
     print("\n✅ Data import completed successfully")
 
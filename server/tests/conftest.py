@@ -0,0 +1,6 @@
+import os
+import sys
+
+# infrastructure.supabase_inf builds its client at import time; tests never reach the network
+os.environ.setdefault("SUPABASE_API_KEY", "test-key")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
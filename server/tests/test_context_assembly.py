@@ -0,0 +1,60 @@
+from langchain.schema import Document
+
+from infrastructure.context_assembly import ContextAssembler, count_tokens
+
+
+def resume(user_id, text, score):
+    return Document(page_content=text, metadata={"id": user_id, "score": score})
+
+
+def paragraphs(topic, count, words=60):
+    return "\n\n".join(" ".join([topic] * words) for _ in range(count))
+
+
+def test_keeps_only_the_best_hit_per_user():
+    assembler = ContextAssembler(lexical_weight=0.0)
+    context = assembler.assemble("robotics", [
+        resume(1, "older resume", 0.2),
+        resume(1, "latest resume", 0.9),
+        resume(2, "other candidate", 0.5),
+    ])
+
+    assert [doc.page_content for doc in context] == ["latest resume", "other candidate"]
+
+
+def test_stays_within_the_token_budget_best_candidates_first():
+    assembler = ContextAssembler(token_budget=100, chunk_tokens=40, max_chunks_per_user=5, lexical_weight=0.0)
+    documents = [resume(user_id, paragraphs(f"skill{user_id}", 4), score)
+                 for user_id, score in ((1, 0.9), (2, 0.8), (3, 0.1))]
+
+    context = assembler.assemble("anything", documents)
+
+    assert sum(count_tokens(doc.page_content) for doc in context) <= 100
+    assert context[0].metadata["id"] == 1
+    assert all(doc.metadata["id"] != 3 for doc in context)
+
+
+def test_caps_chunks_per_user():
+    assembler = ContextAssembler(token_budget=10000, chunk_tokens=40, max_chunks_per_user=2)
+    context = assembler.assemble("python", [resume(1, paragraphs("python", 6), 0.9)])
+
+    assert len(context) == 2
+    assert [doc.metadata["chunk"] for doc in context] == [0, 1]
+
+
+def test_query_overlap_breaks_ties_between_equal_scores():
+    assembler = ContextAssembler(lexical_weight=0.5)
+    context = assembler.assemble("machine learning", [
+        resume(1, "Accountant, tax and audit", 0.7),
+        resume(2, "Machine learning engineer", 0.7),
+    ])
+
+    assert [doc.metadata["id"] for doc in context] == [2, 1]
+
+
+def test_oversized_paragraph_is_split_into_chunks():
+    assembler = ContextAssembler(chunk_tokens=50)
+    chunks = assembler.chunk(" ".join(["word"] * 1000))
+
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 60 for chunk in chunks)
@@ -0,0 +1,72 @@
+from infrastructure.embedding_cache import QueryEmbeddingCache
+
+
+class FakeEmbeddings:
+    model = "fake-model"
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return [float(len(text)), 1.0]
+
+
+def test_saved_cache_is_reused_for_the_same_profile(tmp_path):
+    path = str(tmp_path / "queries.pkl")
+    cache = QueryEmbeddingCache(FakeEmbeddings(), path=path, namespace="small512:text-embedding-3-small:512")
+    cache.embed("Who founded it?")
+    cache.save()
+
+    embeddings = FakeEmbeddings()
+    cache = QueryEmbeddingCache(embeddings, path=path, namespace="small512:text-embedding-3-small:512")
+    cache.embed("who founded  it?")
+    assert embeddings.calls == 0
+
+
+def test_saved_cache_of_another_profile_is_discarded(tmp_path):
+    path = str(tmp_path / "queries.pkl")
+    cache = QueryEmbeddingCache(FakeEmbeddings(), path=path, namespace="float:text-embedding-ada-002:1536")
+    cache.embed("Who founded it?")
+    cache.save()
+
+    embeddings = FakeEmbeddings()
+    cache = QueryEmbeddingCache(embeddings, path=path, namespace="small256:text-embedding-3-small:256")
+    assert len(cache.cache) == 0
+    cache.embed("Who founded it?")
+    assert embeddings.calls == 1
+
+
+def test_aembed_saves_like_embed(tmp_path):
+    import asyncio
+    import os
+    import time
+
+    class AsyncEmbeddings(FakeEmbeddings):
+        async def aembed_query(self, text):
+            return self.embed_query(text)
+
+    path = str(tmp_path / "queries.pkl")
+    cache = QueryEmbeddingCache(AsyncEmbeddings(), path=path, save_every=2)
+    asyncio.run(cache.aembed("first question"))
+    asyncio.run(cache.aembed("second question"))
+
+    deadline = time.monotonic() + 5
+    while not os.path.exists(path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(QueryEmbeddingCache(AsyncEmbeddings(), path=path).cache) == 2
+
+
+def test_embed_saves_in_the_background(tmp_path):
+    import os
+    import time
+
+    path = str(tmp_path / "queries.pkl")
+    cache = QueryEmbeddingCache(FakeEmbeddings(), path=path, save_every=2)
+    cache.embed("first question")
+    cache.embed("second question")
+
+    deadline = time.monotonic() + 5
+    while not os.path.exists(path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(QueryEmbeddingCache(FakeEmbeddings(), path=path).cache) == 2
@@ -0,0 +1,37 @@
+from infrastructure.embedding_store import EmbeddingStore
+
+
+class FakeEmbeddings:
+    model = "fake-model"
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += len(texts)
+        return [[float(len(text)), float(ord(text[0])), 1.0] for text in texts]
+
+
+def test_two_writers_on_one_directory_keep_their_own_vectors(tmp_path):
+    first = EmbeddingStore(str(tmp_path), FakeEmbeddings())
+    second = EmbeddingStore(str(tmp_path), FakeEmbeddings())
+
+    first.embed_documents(["aaaa"])
+    second.embed_documents(["bbbbbbbb"])
+    first.embed_documents(["cc"])
+
+    fresh = EmbeddingStore(str(tmp_path), FakeEmbeddings())
+    assert fresh.embed_documents(["aaaa", "bbbbbbbb", "cc"]) == [
+        [4.0, 97.0, 1.0], [8.0, 98.0, 1.0], [2.0, 99.0, 1.0]
+    ]
+    assert fresh.embeddings.calls == 0
+
+
+def test_store_sees_vectors_another_writer_added(tmp_path):
+    first = EmbeddingStore(str(tmp_path), FakeEmbeddings())
+    second = EmbeddingStore(str(tmp_path), FakeEmbeddings())
+
+    first.embed_documents(["shared text"])
+
+    assert second.embed_documents(["shared text"]) == [[11.0, 115.0, 1.0]]
+    assert second.embeddings.calls == 0
@@ -0,0 +1,65 @@
+from types import SimpleNamespace
+
+from infrastructure import indexing_pipeline
+from infrastructure.indexing_pipeline import IndexingPipeline, content_hash, row_hash
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+def indexed(row):
+    """The hit ES returns for a row indexed earlier: string _id, hashes in _source"""
+    return {"_id": str(row["user_id"]),
+            "_source": {"content_hash": content_hash(row.get("about_me")), "row_hash": row_hash(row)}}
+
+
+def test_incremental_actions_embed_update_skip_and_delete(monkeypatch):
+    unchanged = {"user_id": 1, "about_me": "Builds robots", "major": "ME"}
+    text_changed = {"user_id": 2, "about_me": "Old bio", "major": "CS"}
+    field_changed = {"user_id": 3, "about_me": "Designs chips", "major": "EE"}
+    removed = {"user_id": 4, "about_me": "Left the platform", "major": "Math"}
+    hits = [indexed(row) for row in (unchanged, text_changed, field_changed, removed)]
+    monkeypatch.setattr(indexing_pipeline.helpers, "scan", lambda es, **kwargs: iter(hits))
+    es = SimpleNamespace(indices=SimpleNamespace(exists=lambda index: True))
+    embeddings = FakeEmbeddings()
+    pipeline = IndexingPipeline(es, embeddings, supabase_inf=SimpleNamespace(), batch_size=2, max_workers=1)
+
+    rows = [unchanged,
+            {**text_changed, "about_me": "New bio"},
+            {**field_changed, "major": "CS"},
+            {"user_id": 5, "about_me": "Just joined", "major": "Bio"}]
+    counts = {"embedded": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+    actions = list(pipeline._incremental_actions(iter(rows), "user_index3", "user_id", "about_me",
+                                                 "about_me_vector", counts))
+
+    by_op = {}
+    for action in actions:
+        by_op.setdefault(action.get("_op_type", "index"), []).append(action)
+    assert [action["_id"] for action in by_op["index"]] == [2, 5]
+    assert embeddings.texts == ["New bio", "Just joined"]
+    assert by_op["index"][0]["_source"]["about_me_vector"] == [7.0, 1.0]
+    assert [action["_id"] for action in by_op["update"]] == [3]
+    assert by_op["update"][0]["doc"]["major"] == "CS"
+    assert "about_me_vector" not in by_op["update"][0]["doc"]
+    # int row ids match the string ES ids, so only the vanished row is deleted
+    assert [action["_id"] for action in by_op["delete"]] == ["4"]
+    assert counts == {"embedded": 2, "updated": 1, "deleted": 1, "unchanged": 1}
+
+
+def test_incremental_actions_on_a_missing_index_embed_everything(monkeypatch):
+    monkeypatch.setattr(indexing_pipeline.helpers, "scan", lambda es, **kwargs: iter(()))
+    es = SimpleNamespace(indices=SimpleNamespace(exists=lambda index: False))
+    pipeline = IndexingPipeline(es, FakeEmbeddings(), supabase_inf=SimpleNamespace(), max_workers=1)
+    counts = {"embedded": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+
+    actions = list(pipeline._incremental_actions(iter([{"user_id": 1, "about_me": ""}]), "user_index3",
+                                                 "user_id", "about_me", "about_me_vector", counts))
+
+    assert [action["_id"] for action in actions] == [1]
+    assert counts == {"embedded": 1, "updated": 0, "deleted": 0, "unchanged": 0}
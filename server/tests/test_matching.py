@@ -0,0 +1,59 @@
+from infrastructure.matching import MatchingEngine
+
+
+class FakeIndices:
+    def __init__(self):
+        self.refreshed = []
+
+    def refresh(self, index):
+        self.refreshed.append(index)
+
+
+class FakeElasticsearch:
+    def __init__(self):
+        self.indices = FakeIndices()
+
+
+def test_build_without_vectors_is_an_empty_engine(tmp_path):
+    engine = MatchingEngine.build([], [], [])
+
+    assert len(engine) == 0
+    assert engine.candidates(1) == []
+    engine.save(str(tmp_path / "users"))
+    assert len(MatchingEngine.load(str(tmp_path / "users"))) == 0
+
+
+def test_build_ranks_nearest_users_first():
+    vectors = [[1.0, 0.0], [0.9, 0.1], [0.0, 1.0]]
+    sources = [{"major": "CS"}, {"major": "EE"}, {"major": "ME"}]
+    engine = MatchingEngine.build([1, 2, 3], vectors, sources, k=2, same_major_weight=0, same_university_weight=0)
+
+    assert [user_id for user_id, _ in engine.candidates(1)] == ["2", "3"]
+
+
+def test_from_elasticsearch_refreshes_before_scanning(monkeypatch):
+    from elasticsearch import helpers
+
+    es = FakeElasticsearch()
+
+    def scan(client, index, **kwargs):
+        assert es.indices.refreshed == [index]
+        return iter(())
+
+    monkeypatch.setattr(helpers, "scan", scan)
+    engine = MatchingEngine.from_elasticsearch(es, "user_index3")
+    assert len(engine) == 0
+
+
+def test_blocked_top_k_matches_a_full_sort_across_blocks():
+    import numpy as np
+    from infrastructure.matching import blocked_top_k
+
+    rng = np.random.default_rng(0)
+    queries, corpus = rng.normal(size=(7, 4)).astype(np.float32), rng.normal(size=(9, 4)).astype(np.float32)
+
+    indices, scores = blocked_top_k(queries, corpus, 3, block_rows=2)
+
+    expected = np.argsort(-(queries @ corpus.T), axis=1)[:, :3]
+    assert (indices == expected).all()
+    assert (np.diff(scores, axis=1) <= 0).all()
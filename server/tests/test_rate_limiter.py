@@ -0,0 +1,24 @@
+from infrastructure.rate_limiter import InMemoryBucketBackend, RateLimitRule, client_address
+
+RULE = RateLimitRule(capacity=1, rate=0.001)
+
+
+def test_forwarded_for_ignored_without_trusted_proxies():
+    assert client_address("10.0.0.5", "1.2.3.4", trusted_proxies=0) == "10.0.0.5"
+
+
+def test_forwarded_for_uses_entry_added_by_trusted_proxy():
+    # The client prepended 6.6.6.6; the proxy appended the address it saw
+    assert client_address("10.0.0.1", "6.6.6.6, 203.0.113.7", trusted_proxies=1) == "203.0.113.7"
+    assert client_address("10.0.0.1", "", trusted_proxies=1) == "10.0.0.1"
+
+
+def test_least_recently_used_bucket_is_evicted():
+    backend = InMemoryBucketBackend(max_keys=2)
+    backend.take("a", RULE)
+    backend.take("b", RULE)
+    assert backend.take("a", RULE) > 0
+    backend.take("c", RULE)
+
+    assert list(backend._buckets) == ["a", "c"]
+    assert backend.take("a", RULE) > 0
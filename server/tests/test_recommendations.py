@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+
+from infrastructure.recommendations import RecommendationJob, RECOMMENDATION_TABLE
+
+
+class FakeTable:
+    def __init__(self, rows):
+        self.rows = rows
+        self.action = None
+
+    def upsert(self, batch, on_conflict):
+        self.action = ("upsert", batch)
+        return self
+
+    def delete(self):
+        self.action = ("delete", None)
+        return self
+
+    def lt(self, column, value):
+        self.action = ("delete", lambda row: row[column] < value)
+        return self
+
+    def execute(self):
+        kind, payload = self.action
+        if kind == "upsert":
+            for row in payload:
+                self.rows[(row["startup_id"], row["rank"])] = row
+        else:
+            for key in [key for key, row in self.rows.items() if payload(row)]:
+                del self.rows[key]
+        return SimpleNamespace(data=[])
+
+
+def make_job(rows):
+    supabase = SimpleNamespace(client=SimpleNamespace(table=lambda name: FakeTable(rows)))
+    return RecommendationJob(es=None, embeddings=None, supabase_inf=supabase, write_batch_size=2)
+
+
+def test_write_removes_ranks_and_startups_of_earlier_runs():
+    rows = {}
+    make_job(rows).write([(1, [(10, 0.9), (11, 0.8), (12, 0.7)]), (2, [(10, 0.5)])])
+    make_job(rows).write([(1, [(12, 0.95)])])
+
+    assert sorted(rows) == [(1, 0)]
+    assert rows[(1, 0)]["user_id"] == 12
+
+
+def test_rank_never_recommends_a_startups_own_founders():
+    import numpy as np
+
+    job = make_job({})
+    job.top_n = 2
+    startups = [{"startup_id": 7, "cofounders": "(1)"}, {"startup_id": 8, "cofounders": ""}]
+    users = np.array([[1.0, 0.0], [0.8, 0.6], [0.0, 1.0]], dtype=np.float32)
+
+    ranked = dict(job.rank(startups, np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32), [1, 2, 3], users))
+
+    assert [user_id for user_id, _ in ranked[7]] == [2, 3]
+    assert [user_id for user_id, _ in ranked[8]] == [3, 2]
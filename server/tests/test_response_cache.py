@@ -0,0 +1,82 @@
+from infrastructure import response_cache
+from infrastructure.response_cache import SemanticResponseCache
+
+VECTORS = {
+    "who founded it?": [1.0, 0.0, 0.0],
+    "who are the founders?": [0.99, 0.1, 0.0],
+    "what do they sell?": [0.0, 1.0, 0.0],
+}
+
+
+class FakeEmbedder:
+    def __init__(self):
+        self.calls = 0
+
+    def embed(self, question):
+        self.calls += 1
+        return VECTORS[question.lower()]
+
+
+def ask(cache, question, startup_id=1, context_hash="v1"):
+    answer, vector = cache.lookup(startup_id, context_hash, question)
+    if answer is None:
+        cache.store(startup_id, context_hash, question, vector, f"answer to {question}")
+    return answer
+
+
+def test_verbatim_question_hits_without_embedding():
+    embedder = FakeEmbedder()
+    cache = SemanticResponseCache(embedder)
+    ask(cache, "Who founded it?")
+
+    assert ask(cache, "  who FOUNDED it? ") == "answer to Who founded it?"
+    assert embedder.calls == 1
+
+
+def test_similar_question_hits_above_the_threshold_only():
+    cache = SemanticResponseCache(FakeEmbedder(), threshold=0.95)
+    ask(cache, "Who founded it?")
+
+    assert ask(cache, "Who are the founders?") == "answer to Who founded it?"
+    assert ask(cache, "What do they sell?") is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_answers_are_scoped_to_startup_and_founder_context():
+    cache = SemanticResponseCache(FakeEmbedder())
+    ask(cache, "Who founded it?")
+
+    assert ask(cache, "Who founded it?", startup_id=2) is None
+    assert ask(cache, "Who founded it?", context_hash="v2") is None
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "monotonic", lambda: now[0])
+    cache = SemanticResponseCache(FakeEmbedder(), ttl=60)
+    ask(cache, "Who founded it?")
+
+    now[0] += 61
+    assert ask(cache, "Who founded it?") is None
+
+
+def test_least_recently_used_answer_is_evicted():
+    cache = SemanticResponseCache(FakeEmbedder(), maxsize=2)
+    ask(cache, "Who founded it?", startup_id=1)
+    ask(cache, "Who founded it?", startup_id=2)
+    ask(cache, "Who founded it?", startup_id=1)  # hit, now most recent
+    ask(cache, "Who founded it?", startup_id=3)
+
+    assert cache.stats()["size"] == 2
+    assert ask(cache, "Who founded it?", startup_id=1) is not None
+    assert ask(cache, "Who founded it?", startup_id=2) is None
+
+
+def test_invalidate_one_startup():
+    cache = SemanticResponseCache(FakeEmbedder())
+    ask(cache, "Who founded it?", startup_id=1)
+    ask(cache, "Who founded it?", startup_id=2)
+
+    cache.invalidate(1)
+    assert ask(cache, "Who founded it?", startup_id=1) is None
+    assert ask(cache, "Who founded it?", startup_id=2) is not None
@@ -0,0 +1,109 @@
+import asyncio
+import json
+import time
+
+from infrastructure import sse
+from infrastructure.sse import HEARTBEAT, TokenBatcher, astream_sse, stream_sse
+
+
+def texts(events):
+    return [json.loads(event[len("data: "):])["text"] for event in events if event.startswith("data: ")]
+
+
+class SlowChunks:
+    """Blocking LLM stream: `delay` seconds per token, records whether it was closed"""
+
+    def __init__(self, tokens, delay=0.0, fail_after=None):
+        self.tokens = list(tokens)
+        self.delay = delay
+        self.fail_after = fail_after
+        self.closed = False
+
+    def __iter__(self):
+        for i, token in enumerate(self.tokens):
+            if i == self.fail_after:
+                raise RuntimeError("model overloaded")
+            time.sleep(self.delay)
+            yield token
+
+    def close(self):
+        self.closed = True
+
+
+def test_batcher_sends_first_token_then_batches_by_size(monkeypatch):
+    monkeypatch.setattr(sse.time, "monotonic", lambda: 100.0)
+    batcher = TokenBatcher(max_chars=6, max_delay=1.0)
+
+    assert texts([batcher.add("Hi")]) == ["Hi"]
+    assert batcher.add(" the") is None
+    assert batcher.pending
+    assert texts([batcher.add("re!")]) == [" there!"]
+    assert batcher.flush() is None
+
+
+def test_batcher_cuts_an_event_after_max_delay(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(sse.time, "monotonic", lambda: now[0])
+    batcher = TokenBatcher(max_chars=100, max_delay=0.05)
+    batcher.add("a")
+
+    assert batcher.add("b") is None
+    now[0] += 0.06
+    assert texts([batcher.add("c")]) == ["bc"]
+
+
+def test_stream_sse_delivers_the_whole_answer():
+    answers = []
+    events = list(stream_sse(SlowChunks(["Sarah ", "founded ", "it."]), "test", max_chars=8,
+                             on_complete=answers.append))
+
+    assert "".join(texts(events)) == "Sarah founded it."
+    assert answers == ["Sarah founded it."]
+
+
+def test_stream_sse_sends_heartbeats_while_the_model_is_silent():
+    events = list(stream_sse(SlowChunks(["late"], delay=0.2), "test", heartbeat=0.05))
+
+    assert HEARTBEAT in events
+    assert texts(events) == ["late"]
+
+
+def test_stream_sse_reports_errors_and_skips_on_complete():
+    answers = []
+    events = list(stream_sse(SlowChunks(["a", "b"], fail_after=1), "test", on_complete=answers.append))
+
+    assert json.loads(events[-1][len("data: "):]) == {"error": "model overloaded"}
+    assert answers == []
+
+
+def test_stream_sse_stops_the_model_when_the_client_disconnects():
+    chunks = SlowChunks(["token"] * 100, delay=0.01)
+    stream = stream_sse(chunks, "test")
+    next(stream)
+    stream.close()
+
+    deadline = time.monotonic() + 5
+    while not chunks.closed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert chunks.closed
+
+
+def test_astream_sse_stops_when_the_client_disconnects():
+    closed = []
+
+    async def chunks():
+        try:
+            while True:
+                await asyncio.sleep(1)
+                yield "never"
+        finally:
+            closed.append(True)
+
+    async def is_disconnected():
+        return True
+
+    async def collect():
+        return [event async for event in astream_sse(chunks(), "test", is_disconnected, heartbeat=0.01)]
+
+    assert asyncio.run(collect()) == []
+    assert closed == [True]
@@ -0,0 +1,180 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from infrastructure.startup_cards import StartupCardStore
+from infrastructure.swipe_deck import SwipeDeck
+
+
+class FakeQuery:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def select(self, columns):
+        return self
+
+    def order(self, column):
+        return self
+
+    def range(self, start, stop):
+        self.rows = self.rows[start:stop + 1]
+        return self
+
+    def in_(self, column, ids):
+        self.rows = [row for row in self.rows if row[column] in ids]
+        return self
+
+    def execute(self):
+        return SimpleNamespace(data=self.rows)
+
+
+class FakeSupabase:
+    def __init__(self, startups, users):
+        self.startups = startups
+        self.users = users
+        self.startup_reads = 0
+        self.client = SimpleNamespace(table=self._table)
+
+    def _table(self, name):
+        self.startup_reads += 1
+        return FakeQuery(list(self.startups))
+
+    def get_users_by_ids(self, user_ids, columns="*"):
+        return [self.users[user_id] for user_id in user_ids if user_id in self.users]
+
+
+def make_supabase():
+    startups = [{"startup_id": i, "name": f"Startup {i}", "cofounders": f"({i}, {i + 1})"} for i in range(1, 31)]
+    users = {i: {"user_id": i, "name": f"User {i}", "major": "CS"} for i in range(1, 32)}
+    return FakeSupabase(startups, users)
+
+
+def draw_with_timeout(deck, count, timeout=5):
+    result = {}
+    worker = threading.Thread(target=lambda: result.setdefault("cards", deck.draw(count)), daemon=True)
+    worker.start()
+    worker.join(timeout)
+    assert not worker.is_alive(), "draw() deadlocked"
+    return result["cards"]
+
+
+def test_draw_from_cold_card_store():
+    supabase = make_supabase()
+    deck = None
+    store = StartupCardStore(supabase, on_change=lambda ids: deck.invalidate())
+    deck = SwipeDeck(supabase, table="startup_table", id_column="startup_id",
+                     deck_size=20, low_watermark=0, source=store)
+
+    cards = draw_with_timeout(deck, 10)
+
+    assert len(cards) == 10
+    assert all(len(card["cofounders"]) == 2 for card in cards)
+    assert len(draw_with_timeout(deck, 10)) == 10
+
+
+def test_invalidate_drops_dealt_cards_on_next_draw():
+    supabase = make_supabase()
+    store = StartupCardStore(supabase)
+    deck = SwipeDeck(supabase, table="startup_table", id_column="startup_id",
+                     deck_size=30, low_watermark=0, source=store)
+    draw_with_timeout(deck, 1)
+
+    supabase.startups[0]["name"] = "Renamed"
+    store.refresh_startups([1])
+    deck.invalidate()
+    names = {card["name"] for card in draw_with_timeout(deck, 30)}
+
+    assert "Renamed" in names
+    assert "Startup 1" not in names
+
+
+def test_unknown_startup_is_negative_cached_and_keeps_the_deck():
+    supabase = make_supabase()
+    changes = []
+    store = StartupCardStore(supabase, on_change=changes.append)
+    deck = SwipeDeck(supabase, table="startup_table", id_column="startup_id",
+                     deck_size=30, low_watermark=0, source=store)
+    draw_with_timeout(deck, 1)
+    reads = supabase.startup_reads
+
+    assert store.get(999999) is None
+    assert store.get(999999) is None
+    assert supabase.startup_reads == reads + 1
+    assert changes == [set(range(1, 31))]  # only the initial build
+    assert len(draw_with_timeout(deck, 29)) == 29
+
+
+def test_single_card_refresh_only_discards_that_card():
+    supabase = make_supabase()
+    store = StartupCardStore(supabase)
+    deck = SwipeDeck(supabase, table="startup_table", id_column="startup_id",
+                     deck_size=30, low_watermark=0, source=store)
+    store.on_change = deck.invalidate
+    draw_with_timeout(deck, 1)
+
+    supabase.startups[1]["name"] = "Renamed"
+    store.refresh_startups([2])
+    store.refresh_startups([3])  # unchanged, must not touch the deck
+    # 29 cards were left, at most card 2 is dropped, so this never refills
+    cards = draw_with_timeout(deck, 28)
+
+    assert 2 not in {card["startup_id"] for card in cards}
+
+
+def test_stale_store_rebuilds_in_background():
+    store = StartupCardStore(make_supabase(), max_age=600)
+    assert len(store.ids()) == 30
+    store._built_at -= 601
+    store.ids()
+    deadline = time.monotonic() + 5
+    while store._rebuilding and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not store._rebuilding
+    assert store.stats()["age_seconds"] < 600
+
+
+def test_refill_never_deals_a_card_twice():
+    supabase = make_supabase()
+    store = StartupCardStore(supabase)
+    deck = SwipeDeck(supabase, table="startup_table", id_column="startup_id",
+                     deck_size=20, low_watermark=0, source=store)
+    draw_with_timeout(deck, 1)
+
+    # 19 cards left; the synchronous refill samples 20 more, most of them already in the deck
+    cards = draw_with_timeout(deck, 25)
+    ids = [card["startup_id"] for card in cards]
+    assert len(ids) == len(set(ids))
+
+
+def test_rebuild_reports_only_the_cards_that_changed():
+    supabase = make_supabase()
+    changes = []
+    store = StartupCardStore(supabase, on_change=changes.append)
+    store.rebuild()
+    changes.clear()
+
+    store.rebuild()
+    assert changes == []
+
+    supabase.startups[4]["name"] = "Renamed"
+    del supabase.startups[9]
+    store.rebuild()
+    assert changes == [{5, 10}]
+
+
+def test_id_index_is_read_in_id_order():
+    supabase = make_supabase()
+    supabase.startups.reverse()
+    orders = []
+    table = supabase._table
+
+    def ordered_table(name):
+        query = table(name)
+        query.order = lambda column: orders.append(column) or query
+        return query
+
+    supabase.client.table = ordered_table
+    deck = SwipeDeck(supabase, table="startup_table", id_column="startup_id", deck_size=5, low_watermark=0)
+
+    assert sorted(deck._load_ids()) == list(range(1, 31))
+    assert orders == ["startup_id"]
@@ -0,0 +1,30 @@
+from infrastructure.vector_index import NumpyVectorIndex
+
+
+def test_empty_export_builds_an_empty_index(tmp_path):
+    for quantize in (False, True):
+        index = NumpyVectorIndex.build(str(tmp_path / f"empty{quantize}"), [], [], [], quantize)
+
+        assert len(index) == 0
+        assert index.search([1.0, 0.0], 10) == []
+        assert index.text_search("founder", 10) == []
+
+
+def test_search_returns_nearest_rows_first(tmp_path):
+    index = NumpyVectorIndex.build(str(tmp_path / "users"), [1, 2, 3],
+                                   [[1.0, 0.0], [0.0, 1.0], [0.7, 0.7]], [{"name": str(i)} for i in range(3)])
+
+    assert [hit["_id"] for hit in index.search([1.0, 0.1], 2)] == ["1", "3"]
+
+
+def test_index_of_another_profile_is_refused(tmp_path):
+    import pytest
+
+    path = str(tmp_path / "users")
+    index = NumpyVectorIndex.build(path, [1, 2], [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
+
+    with pytest.raises(ValueError, match="3-dim"):
+        NumpyVectorIndex.load(path, dims=2)
+    with pytest.raises(ValueError, match="2 dims"):
+        index.search([1.0, 0.0], 1)
+    assert len(NumpyVectorIndex.load(path, dims=3)) == 2